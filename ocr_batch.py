@@ -0,0 +1,204 @@
+"""Bulk batch processing of PDFs with resumable progress and throughput reporting.
+
+Usage:
+    python ocr_batch.py archive/ --output results.jsonl --csv results.csv --workers 4
+    python ocr_batch.py --manifest files.txt --output results.jsonl
+
+Documents already recorded as successful in the output JSONL are skipped, so an
+interrupted run can simply be started again with the same arguments.
+"""
+import os
+import csv
+import json
+import time
+import argparse
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ocr_modul import EnhancedOCRProcessor, DocumentDataExtractor, ItemTableParser, ocr_cache
+
+STAGES = ['ocr', 'extract_main_fields', 'parse_item_table']
+
+CSV_FIELDS = ['path', 'status', 'error', 'pages', 'items_count', 'Supplier', 'Document Number',
+              'Date', 'Status', 'Address', 'To', 'total_seconds']
+
+
+def collect_inputs(inputs, manifest=None):
+    """Expand directories and an optional manifest (one path per line) into a sorted PDF list."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, name) for name in files
+                             if name.lower().endswith('.pdf'))
+        else:
+            paths.append(item)
+
+    if manifest:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            paths.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+    # De-duplicate while keeping a stable order
+    return sorted({os.path.normpath(path) for path in paths})
+
+
+def load_completed(output_path):
+    """Paths already processed successfully according to an existing JSONL output."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get('status') == 'ok':
+                completed.add(record['path'])
+    return completed
+
+
+def process_document(path, settings):
+    """Run the full pipeline on one document and return a result record with stage timings."""
+    timings = {}
+    started = time.perf_counter()
+    record = {'path': path, 'filename': os.path.basename(path)}
+
+    try:
+        processor = EnhancedOCRProcessor(dpi=settings['dpi'],
+                                         use_text_layer=settings['use_text_layer'],
+                                         cache=ocr_cache if settings['use_cache'] else None)
+
+        stage_start = time.perf_counter()
+        ocr_result = processor.process_pdf_to_text(path)
+        timings['ocr'] = time.perf_counter() - stage_start
+
+        if ocr_result['error']:
+            raise RuntimeError(ocr_result['error'])
+
+        stage_start = time.perf_counter()
+        main_data = DocumentDataExtractor().extract_main_fields(ocr_result['text'])
+        timings['extract_main_fields'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        items = ItemTableParser().parse_item_table(ocr_result['text'])
+        timings['parse_item_table'] = time.perf_counter() - stage_start
+
+        record.update({
+            'status': 'ok',
+            'error': None,
+            'pages': ocr_result.get('pages', 0),
+            'page_sources': ocr_result.get('page_sources', {}),
+            'page_errors': ocr_result.get('page_errors', []),
+            'main_fields': main_data,
+            'items': items,
+            'items_count': len(items),
+        })
+    except Exception as e:
+        record.update({'status': 'error', 'error': str(e), 'pages': 0})
+
+    timings['total'] = time.perf_counter() - started
+    record['timings'] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+    return record
+
+
+def csv_row(record):
+    """Flatten a result record into one CSV row of main fields."""
+    row = {field: record.get(field, '') for field in CSV_FIELDS}
+    row.update({field: value for field, value in record.get('main_fields', {}).items()
+                if field in CSV_FIELDS})
+    row['total_seconds'] = record['timings'].get('total', '')
+    return row
+
+
+def print_report(records, wall_seconds, skipped):
+    """Print throughput and per-stage time breakdown for the documents processed in this run."""
+    ok = [record for record in records if record['status'] == 'ok']
+    pages = sum(record.get('pages', 0) for record in ok)
+
+    print("\n📊 Batch summary")
+    print(f"  Documents: {len(records)} processed, {len(ok)} ok, "
+          f"{len(records) - len(ok)} failed, {skipped} skipped (already done)")
+    print(f"  Pages:     {pages}")
+    print(f"  Wall time: {wall_seconds:.2f}s")
+    if wall_seconds > 0:
+        print(f"  Throughput: {len(records) / wall_seconds:.2f} docs/sec, "
+              f"{pages / wall_seconds:.2f} pages/sec")
+
+    if ok:
+        print("  Stage breakdown (summed over documents):")
+        total = sum(record['timings']['total'] for record in ok) or 1.0
+        for stage in STAGES:
+            seconds = sum(record['timings'].get(stage, 0.0) for record in ok)
+            print(f"    {stage:<20} {seconds:9.2f}s  {100 * seconds / total:5.1f}%  "
+                  f"{seconds / len(ok):.3f}s/doc")
+
+
+def run_batch(paths, output_path, csv_path=None, workers=1, settings=None):
+    """Process paths concurrently, appending results as they complete. Returns the new records."""
+    settings = settings or {'dpi': 300, 'use_text_layer': True, 'use_cache': True}
+    completed = load_completed(output_path)
+    pending = [path for path in paths if path not in completed]
+    skipped = len(paths) - len(pending)
+    print(f"🚀 {len(pending)} documents to process ({skipped} already done), {workers} workers")
+
+    records = []
+    started = time.perf_counter()
+
+    with ExitStack() as stack:
+        out = stack.enter_context(open(output_path, 'a', encoding='utf-8'))
+        csv_file = csv_writer = None
+        if csv_path:
+            write_header = not os.path.exists(csv_path)
+            csv_file = stack.enter_context(open(csv_path, 'a', encoding='utf-8', newline=''))
+            csv_writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+            if write_header:
+                csv_writer.writeheader()
+
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=max(1, workers)))
+        futures = [executor.submit(process_document, path, settings) for path in pending]
+        for done, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            records.append(record)
+
+            # Flush each record so progress survives an interrupted run
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            if csv_writer:
+                csv_writer.writerow(csv_row(record))
+                csv_file.flush()
+
+            status = record['status'] if record['status'] == 'ok' else f"error: {record['error']}"
+            print(f"[{done}/{len(pending)}] {record['path']} - {status} "
+                  f"({record.get('pages', 0)} pages, {record['timings']['total']:.2f}s)")
+
+    print_report(records, time.perf_counter() - started, skipped)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch OCR processing of PDF documents.")
+    parser.add_argument('inputs', nargs='*', help="PDF files or directories to scan for PDFs")
+    parser.add_argument('--manifest', help="Text file listing one PDF path per line")
+    parser.add_argument('--output', default='batch_results.jsonl', help="JSONL output (also used to resume)")
+    parser.add_argument('--csv', help="Optional CSV output with one row of main fields per document")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of documents processed concurrently")
+    parser.add_argument('--dpi', type=int, default=300, help="Rasterization DPI for OCR pages")
+    parser.add_argument('--no-text-layer', action='store_true',
+                        help="OCR every page, even where a page has a usable text layer")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the OCR result cache")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.inputs, args.manifest)
+    if not paths:
+        parser.error("no PDF files found in the given inputs")
+
+    settings = {'dpi': args.dpi, 'use_text_layer': not args.no_text_layer, 'use_cache': not args.no_cache}
+    records = run_batch(paths, args.output, args.csv, args.workers, settings)
+    return 0 if all(record['status'] == 'ok' for record in records) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
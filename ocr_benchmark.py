@@ -0,0 +1,439 @@
+"""Benchmarks for the OCR pipeline.
+
+Usage:
+    python ocr_benchmark.py engines PO0625-TDKI-00022.pdf sample-invoice.pdf --repeat 3
+    python ocr_benchmark.py preprocess PO0625-TDKI-00022.pdf sample-invoice.pdf --repeat 5
+    python ocr_benchmark.py suite --repeat 3                 # check against golden outputs
+    python ocr_benchmark.py suite --update-golden            # record new golden outputs
+    python ocr_benchmark.py suite --update-baseline          # record latency, keep expected outputs
+    python ocr_benchmark.py suite --dpi-mode adaptive        # per-page DPI vs the fixed baseline
+
+The suite times every pipeline stage separately on the bundled sample PDFs, reports
+median/p95 latency and peak RSS per document, and exits non-zero when extracted fields
+or items drift from the golden JSON, or latency regresses beyond --max-slowdown. A
+document without a golden output or without a latency baseline fails the suite.
+"""
+import os
+import json
+import time
+import difflib
+import resource
+import argparse
+import statistics
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from pdf2image import convert_from_path
+
+from ocr_modul import EnhancedOCRProcessor, DocumentDataExtractor, ItemTableParser
+from ocr_engine import ENGINES, PytesseractEngine, get_engine
+
+
+def summarize(samples):
+    """Median, p95 and mean of a list of durations in seconds."""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'median': statistics.median(ordered),
+        'p95': ordered[p95_index],
+        'mean': statistics.fmean(ordered),
+        'count': len(ordered),
+    }
+
+
+def render_pages(pdf_paths, dpi=300, max_pages=None, grayscale=True):
+    """Rasterize the benchmark documents once, returning (label, PIL image) pairs."""
+    pages = []
+    for pdf_path in pdf_paths:
+        images = convert_from_path(pdf_path, dpi=dpi, fmt='PNG', last_page=max_pages,
+                                   grayscale=grayscale)
+        pages.extend((f"{pdf_path} p{index}", image) for index, image in enumerate(images, start=1))
+    return pages
+
+
+def benchmark_engines(pdf_paths, engine_names, repeat=3, dpi=300, max_pages=None):
+    """Time every engine on the same enhanced pages and compare their output text."""
+    processor = EnhancedOCRProcessor(dpi=dpi)
+    # enhance_image returns a reused buffer, so keep a copy per page
+    enhanced_pages = [(label, processor.enhance_image(image).copy())
+                      for label, image in render_pages(pdf_paths, dpi, max_pages)]
+
+    results = {}
+    for name in engine_names:
+        started = time.perf_counter()
+        try:
+            engine = get_engine(name, processor.tesseract_config)
+        except Exception as e:
+            print(f"⚠️  Skipping {name}: {e}")
+            continue
+        if engine.name != name:
+            print(f"⚠️  Skipping {name}: not available")
+            continue
+        # Engine start-up (e.g. loading traineddata) is paid once per worker
+        startup = time.perf_counter() - started
+
+        samples, texts = [], []
+        for _, image in enhanced_pages:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text = engine.image_to_string(image)
+                samples.append(time.perf_counter() - started)
+            texts.append(text)
+        results[name] = {'startup': startup, 'per_page': summarize(samples), 'texts': texts}
+
+    print(f"\n📊 Engine benchmark: {len(enhanced_pages)} pages x {repeat} runs at {dpi} DPI")
+    for name, result in results.items():
+        per_page = result['per_page']
+        print(f"  {name:<12} startup {result['startup'] * 1000:8.1f} ms   "
+              f"median {per_page['median'] * 1000:8.1f} ms   p95 {per_page['p95'] * 1000:8.1f} ms")
+
+    baseline = results.get(PytesseractEngine.name)
+    if baseline and len(results) > 1:
+        for name, result in results.items():
+            if name == PytesseractEngine.name:
+                continue
+            speedup = baseline['per_page']['median'] / result['per_page']['median']
+            similarity = statistics.fmean(
+                difflib.SequenceMatcher(None, a, b).ratio()
+                for a, b in zip(baseline['texts'], result['texts'])
+            )
+            print(f"  {name} vs {PytesseractEngine.name}: {speedup:.2f}x faster per page, "
+                  f"text similarity {similarity:.3f}")
+    return results
+
+
+def enhance_image_legacy(image):
+    """The original RGB enhance_image pipeline, kept as the reference for preprocessing benchmarks."""
+    img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    height, width = img_cv.shape[:2]
+    if width < 1800:
+        scale_factor = 1800 / width
+        img_cv = cv2.resize(img_cv, (int(width * scale_factor), int(height * scale_factor)),
+                            interpolation=cv2.INTER_CUBIC)
+    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+    denoised = cv2.medianBlur(gray, 3)
+    enhanced = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8)).apply(denoised)
+    _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, np.ones((2,2), np.uint8))
+
+
+def measure(func, repeat):
+    """Run func repeat times; return (durations, peak traced bytes of one run, last result)."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return durations, peak, result
+
+
+def benchmark_preprocessing(pdf_paths, repeat=5, dpi=300, max_pages=None, tolerance=0.001):
+    """Compare legacy RGB preprocessing with the grayscale buffer-reusing ImagePreprocessor.
+    
+    The legacy path gets RGB renders and the new path grayscale renders, as in production.
+    Returns False when any page differs from the legacy output by more than tolerance
+    (fraction of pixels).
+    """
+    rgb_pages = render_pages(pdf_paths, dpi, max_pages, grayscale=False)
+    gray_pages = render_pages(pdf_paths, dpi, max_pages, grayscale=True)
+    processor = EnhancedOCRProcessor(dpi=dpi)
+
+    print(f"\n📊 Preprocessing benchmark: {len(rgb_pages)} pages x {repeat} runs at {dpi} DPI")
+    print(f"  {'page':<40} {'legacy ms':>10} {'new ms':>8} {'legacy MB':>10} {'new MB':>8} {'diff px':>9}")
+
+    within_tolerance = True
+    legacy_all, new_all = [], []
+    for (label, rgb_image), (_, gray_image) in zip(rgb_pages, gray_pages):
+        legacy_times, legacy_peak, legacy_result = measure(lambda: enhance_image_legacy(rgb_image), repeat)
+        new_times, new_peak, new_result = measure(lambda: processor.enhance_image(gray_image), repeat)
+        legacy_all.extend(legacy_times)
+        new_all.extend(new_times)
+
+        if legacy_result.shape == new_result.shape:
+            mismatch = float(np.count_nonzero(legacy_result != new_result)) / legacy_result.size
+        else:
+            mismatch = 1.0
+        within_tolerance &= mismatch <= tolerance
+
+        print(f"  {label[-40:]:<40} {statistics.median(legacy_times) * 1000:10.1f} "
+              f"{statistics.median(new_times) * 1000:8.1f} {legacy_peak / 2**20:10.1f} "
+              f"{new_peak / 2**20:8.1f} {mismatch:9.2%}")
+
+    legacy_median = statistics.median(legacy_all)
+    new_median = statistics.median(new_all)
+    print(f"  median per page: legacy {legacy_median * 1000:.1f} ms, new {new_median * 1000:.1f} ms "
+          f"({legacy_median / new_median:.2f}x)")
+    print(f"  {'✅' if within_tolerance else '❌'} output within {tolerance:.2%} pixel tolerance")
+    return within_tolerance
+
+
+# Every bundled document; each needs a golden output (--update-golden) and a latency
+# baseline (--update-baseline) or the suite fails
+DEFAULT_DOCUMENTS = [
+    'PO0625-TDKI-00002.pdf',
+    'PO0625-TDKI-00022.pdf',
+    'Cost Doc CDV0825-00482.pdf',
+    'sample-invoice.pdf',
+]
+SUITE_STAGES = ['text_layer', 'rasterize', 'enhance_image', 'tesseract',
+                'extract_main_fields', 'parse_item_table']
+# Item fields compared against the golden output ('Raw Lines' is debug-only)
+ITEM_COMPARE_FIELDS = ['Item Code', 'Description', 'Unit Cost', 'Discount', 'Quantity', 'Total Cost']
+
+
+def benchmark_document(pdf_path, repeat=3, dpi=300, engine='auto', dpi_mode='fixed',
+                       use_text_layer=False):
+    """Time each pipeline stage on one document. Meant to run in a fresh process so the
+    reported peak RSS belongs to this document alone.
+
+    In adaptive DPI mode the rasterize stage includes the low-resolution preview used to
+    pick each page's DPI, and the chosen DPI per page is reported. With use_text_layer,
+    pages with a usable text layer take their text from it, as in the server."""
+    processor = EnhancedOCRProcessor(dpi=dpi, engine=engine, dpi_mode=dpi_mode,
+                                     use_text_layer=use_text_layer)
+    adaptive = dpi_mode == 'adaptive'
+    ocr_engine = processor.get_engine()
+    extractor = DocumentDataExtractor()
+    table_parser = ItemTableParser()
+    page_count = processor.count_pages(pdf_path)
+
+    samples = {stage: [] for stage in SUITE_STAGES}
+    latencies = []
+    page_render = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text_layer = processor.extract_text_layer(pdf_path, 1, page_count)
+        text_layer_seconds = time.perf_counter() - started
+        samples['text_layer'].append(text_layer_seconds)
+
+        if not processor.use_text_layer:
+            text_layer = {}
+        # Every page is rasterized and OCRed so those stages are always measured, but only
+        # pages without a usable text layer count towards the pipeline latency
+        latency = text_layer_seconds if processor.use_text_layer else 0.0
+        page_texts = []
+        for page_number in range(1, page_count + 1):
+            started = time.perf_counter()
+            if adaptive:
+                image = processor.render_page(pdf_path, page_number)
+                page_render[page_number] = processor.last_render
+            else:
+                image = convert_from_path(pdf_path, dpi=dpi, fmt='PNG', grayscale=processor.grayscale,
+                                          first_page=page_number, last_page=page_number)[0]
+            rasterize_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            enhanced = processor.enhance_image(image, scale=1.0 if adaptive else None)
+            enhance_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            text = ocr_engine.image_to_string(enhanced)
+            tesseract_seconds = time.perf_counter() - started
+
+            samples['rasterize'].append(rasterize_seconds)
+            samples['enhance_image'].append(enhance_seconds)
+            samples['tesseract'].append(tesseract_seconds)
+            if page_number in text_layer:
+                page_texts.append(text_layer[page_number])
+            else:
+                page_texts.append(text)
+                latency += rasterize_seconds + enhance_seconds + tesseract_seconds
+            del image
+
+        full_text = "\n\n".join(page_texts)
+
+        started = time.perf_counter()
+        main_fields = extractor.extract_main_fields(full_text)
+        samples['extract_main_fields'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        items = table_parser.parse_item_table(full_text)
+        samples['parse_item_table'].append(time.perf_counter() - started)
+
+        latencies.append(latency + samples['extract_main_fields'][-1] + samples['parse_item_table'][-1])
+
+    main_fields.pop('Extracted At', None)
+    # ru_maxrss is in kilobytes on Linux; children covers pdftoppm/tesseract subprocesses
+    return {
+        'pdf': pdf_path,
+        'pages': page_count,
+        'text_layer_pages': len(text_layer),
+        'stages': {stage: summarize(values) for stage, values in samples.items() if values},
+        'latency': summarize(latencies),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'peak_child_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        'main_fields': main_fields,
+        'items': items,
+        'page_render': page_render,
+    }
+
+
+def golden_path(golden_dir, pdf_path):
+    return os.path.join(golden_dir, os.path.splitext(os.path.basename(pdf_path))[0] + '.json')
+
+
+def compare_with_golden(result, golden):
+    """Field and item accuracy of a benchmark result against its golden output (0.0 - 1.0)."""
+    golden_fields = golden['main_fields']
+    field_matches = sum(1 for field, value in golden_fields.items()
+                        if result['main_fields'].get(field) == value)
+    field_accuracy = field_matches / len(golden_fields) if golden_fields else 1.0
+
+    golden_items = golden['items']
+    item_matches = sum(
+        1 for expected, actual in zip(golden_items, result['items'])
+        if all(expected.get(field) == actual.get(field) for field in ITEM_COMPARE_FIELDS)
+    )
+    item_total = max(len(golden_items), len(result['items']))
+    item_accuracy = item_matches / item_total if item_total else 1.0
+    return field_accuracy, item_accuracy
+
+
+def run_suite(pdf_paths, repeat=3, dpi=300, engine='auto', golden_dir='benchmarks/golden',
+              update_golden=False, max_slowdown=0.25, min_accuracy=0.98, dpi_mode='fixed',
+              use_text_layer=False, update_baseline=False):
+    """Benchmark every document, compare with golden outputs and return (passed, results).
+
+    update_golden overwrites the expected outputs with the current ones; update_baseline
+    only records the latency baseline of documents that already have a golden output,
+    so expected outputs taken from a reference are not replaced by the parser's own.
+    """
+    results = []
+    # One fresh process per document keeps peak RSS figures per document
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for pdf_path in pdf_paths:
+            results.append(executor.submit(benchmark_document, pdf_path, repeat, dpi, engine,
+                                           dpi_mode, use_text_layer).result())
+
+    resolution = "adaptive DPI" if dpi_mode == 'adaptive' else f"{dpi} DPI"
+    print(f"\n📊 Stage benchmark: {repeat} runs per document at {resolution}")
+    passed = True
+    for result in results:
+        print(f"\n  {result['pdf']} ({result['pages']} pages, {result['text_layer_pages']} with text layer)")
+        for stage, summary in result['stages'].items():
+            print(f"    {stage:<20} median {summary['median'] * 1000:9.1f} ms   "
+                  f"p95 {summary['p95'] * 1000:9.1f} ms")
+        latency = result['latency']
+        print(f"    {'pipeline latency':<20} median {latency['median'] * 1000:9.1f} ms   "
+              f"p95 {latency['p95'] * 1000:9.1f} ms   "
+              f"({result['pages'] / latency['median']:.2f} pages/sec)")
+        print(f"    peak RSS {result['peak_rss_mb']:.1f} MB (subprocesses {result['peak_child_rss_mb']:.1f} MB)")
+        for page_number, render in result['page_render'].items():
+            print(f"    page {page_number}: {render['dpi']} DPI, x-height {render['x_height']} px, "
+                  f"~{render['speedup']:.2f}x fewer pixels than {dpi} DPI")
+
+        path = golden_path(golden_dir, result['pdf'])
+        if update_golden:
+            os.makedirs(golden_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'main_fields': result['main_fields'],
+                    'items': result['items'],
+                    'baseline': {'latency_median': latency['median'], 'pages': result['pages'],
+                                 'dpi': dpi, 'dpi_mode': dpi_mode},
+                }, f, indent=2, ensure_ascii=False)
+            print(f"    📝 golden output written to {path}")
+            continue
+
+        if not os.path.exists(path):
+            # A document without a golden output would otherwise pass without any check
+            print(f"    ❌ no golden output at {path} (record one with --update-golden)")
+            passed = False
+            continue
+
+        with open(path, 'r', encoding='utf-8') as f:
+            golden = json.load(f)
+        if update_baseline:
+            golden['baseline'] = {'latency_median': latency['median'], 'pages': result['pages'],
+                                  'dpi': dpi, 'dpi_mode': dpi_mode}
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(golden, f, indent=2, ensure_ascii=False)
+            print(f"    📝 latency baseline written to {path}")
+        field_accuracy, item_accuracy = compare_with_golden(result, golden)
+        checks = [
+            (field_accuracy >= min_accuracy, f"field accuracy {field_accuracy:.1%}"),
+            (item_accuracy >= min_accuracy, f"item accuracy {item_accuracy:.1%}"),
+        ]
+        baseline_latency = golden['baseline'].get('latency_median')
+        if baseline_latency:
+            slowdown = latency['median'] / baseline_latency - 1
+            checks.append((slowdown <= max_slowdown, f"latency {slowdown:+.1%} vs baseline"))
+        else:
+            # Golden outputs taken from a reference carry no timing; without one a
+            # throughput regression would go unnoticed
+            checks.append((False, "no latency baseline (record one with --update-baseline)"))
+        for ok, message in checks:
+            print(f"    {'✅' if ok else '❌'} {message}")
+            passed &= ok
+
+    return passed, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR pipeline benchmarks.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    engines_parser = subparsers.add_parser('engines', help="Compare OCR engine backends")
+    engines_parser.add_argument('pdfs', nargs='+', help="PDF files to benchmark on")
+    engines_parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    engines_parser.add_argument('--repeat', type=int, default=3)
+    engines_parser.add_argument('--dpi', type=int, default=300)
+    engines_parser.add_argument('--max-pages', type=int, help="Only use the first N pages of each PDF")
+
+    preprocess_parser = subparsers.add_parser('preprocess', help="Compare legacy and current enhance_image")
+    preprocess_parser.add_argument('pdfs', nargs='+', help="PDF files to benchmark on")
+    preprocess_parser.add_argument('--repeat', type=int, default=5)
+    preprocess_parser.add_argument('--dpi', type=int, default=300)
+    preprocess_parser.add_argument('--max-pages', type=int, help="Only use the first N pages of each PDF")
+    preprocess_parser.add_argument('--tolerance', type=float, default=0.001,
+                                   help="Max fraction of differing output pixels per page")
+
+    suite_parser = subparsers.add_parser('suite', help="Per-stage benchmark with golden output checks")
+    suite_parser.add_argument('pdfs', nargs='*', default=DEFAULT_DOCUMENTS,
+                              help="PDF files (default: the bundled documents with golden outputs)")
+    suite_parser.add_argument('--repeat', type=int, default=3)
+    suite_parser.add_argument('--dpi', type=int, default=300)
+    suite_parser.add_argument('--engine', default='auto')
+    suite_parser.add_argument('--dpi-mode', choices=['fixed', 'adaptive'], default='fixed',
+                              help="adaptive picks each page's DPI from a preview; compare its accuracy "
+                                   "and latency against golden outputs recorded in fixed mode")
+    suite_parser.add_argument('--text-layer', action='store_true',
+                              help="Take text from usable embedded text layers, as the server does "
+                                   "by default; the committed golden outputs were recorded with OCR")
+    suite_parser.add_argument('--golden-dir', default='benchmarks/golden')
+    suite_parser.add_argument('--update-golden', action='store_true',
+                              help="Record current outputs and latency as the new golden baseline")
+    suite_parser.add_argument('--update-baseline', action='store_true',
+                              help="Record the latency baseline, keeping the expected outputs")
+    suite_parser.add_argument('--max-slowdown', type=float, default=0.25,
+                              help="Allowed median latency increase over the baseline (0.25 = 25%%)")
+    suite_parser.add_argument('--min-accuracy', type=float, default=0.98,
+                              help="Minimum field/item accuracy against the golden output")
+    suite_parser.add_argument('--json-report', help="Write the raw benchmark results to this file")
+
+    args = parser.parse_args(argv)
+    if args.command == 'suite':
+        passed, results = run_suite(args.pdfs, args.repeat, args.dpi, args.engine, args.golden_dir,
+                                    args.update_golden, args.max_slowdown, args.min_accuracy,
+                                    args.dpi_mode, args.text_layer, args.update_baseline)
+        if args.json_report:
+            with open(args.json_report, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        return 0 if passed else 1
+    elif args.command == 'engines':
+        benchmark_engines(args.pdfs, args.engines, args.repeat, args.dpi, args.max_pages)
+    elif args.command == 'preprocess':
+        if not benchmark_preprocessing(args.pdfs, args.repeat, args.dpi, args.max_pages, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+
+class OCRResultCache:
+    """Content-addressed on-disk cache of per-page OCR text with LRU eviction by total bytes."""
+
+    def __init__(self, cache_dir='ocr_cache', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def make_key(self, pdf_path, settings):
+        """Hash the file bytes together with the settings that affect OCR output.
+
+        pdf_path may also be the PDF's bytes.
+        """
+        digest = hashlib.sha256()
+        if isinstance(pdf_path, bytes):
+            digest.update(pdf_path)
+        else:
+            with open(pdf_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached page results for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages = json.load(f)["pages"]
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path, None)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, key, pages):
+        """Store page results under key and evict least recently used entries if over budget."""
+        data = json.dumps({"pages": pages}, ensure_ascii=False).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+
+        # Write atomically so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        path = self._entry_path(key)
+        with self._lock:
+            total = self._current_total()
+            if os.path.exists(path):
+                total -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self._total_bytes = total + len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _current_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._entries())
+        return self._total_bytes
+
+    def _entries(self):
+        """List (mtime, path, size) for every cache entry."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes': self._current_total(),
+                'max_bytes': self.max_bytes,
+            }
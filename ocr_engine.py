@@ -0,0 +1,182 @@
+import shlex
+import threading
+import importlib.util
+
+import numpy as np
+
+# Engine modules are imported on first use: pytesseract imports pandas eagerly when it is
+# installed, which alone costs hundreds of milliseconds at startup
+TESSEROCR_AVAILABLE = importlib.util.find_spec('tesserocr') is not None  # optional bindings
+
+# Word-level result fields shared by every engine's image_to_data
+DATA_FIELDS = ['block_num', 'par_num', 'line_num', 'word_num', 'left', 'top', 'width', 'height']
+
+
+class OCRTimeoutError(RuntimeError):
+    """Raised when a Tesseract call does not finish within its timeout."""
+
+
+def parse_tesseract_config(config):
+    """Split a tesseract command-line config into (lang, psm, oem, variables).
+
+    Tokens are split with shlex exactly as pytesseract does, so both engines see the
+    same effective settings (e.g. the same tessedit_char_whitelist).
+    """
+    lang, psm, oem, variables = 'eng', 3, 3, {}
+    tokens = shlex.split(config or '')
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        value = tokens[index + 1] if index + 1 < len(tokens) else None
+        if token == '--psm' and value is not None:
+            psm = int(value)
+            index += 1
+        elif token == '--oem' and value is not None:
+            oem = int(value)
+            index += 1
+        elif token == '-l' and value is not None:
+            lang = value
+            index += 1
+        elif token == '-c' and value is not None and '=' in value:
+            name, setting = value.split('=', 1)
+            variables[name] = setting
+            index += 1
+        index += 1
+    return lang, psm, oem, variables
+
+
+class PytesseractEngine:
+    """Runs the tesseract CLI through pytesseract: one subprocess and temp file per call."""
+
+    name = 'pytesseract'
+
+    def __init__(self, config):
+        import pytesseract  # Python wrapper for Tesseract OCR engine (subprocess per call)
+        self.pytesseract = pytesseract
+        self.config = config
+
+    def _run(self, function, *args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except RuntimeError as e:
+            # pytesseract kills the tesseract process and raises a plain RuntimeError
+            if 'timeout' in str(e).lower():
+                raise OCRTimeoutError(f"Tesseract timed out after {kwargs['timeout']:.1f}s") from e
+            raise
+
+    def image_to_string(self, image, timeout=0):
+        return self._run(self.pytesseract.image_to_string, image, config=self.config, timeout=timeout)
+
+    def image_to_data(self, image, config=None, timeout=0):
+        """Word boxes and confidences as a list of dicts (text, conf, left, top, ...)."""
+        data = self._run(self.pytesseract.image_to_data, image, config=config or self.config,
+                         timeout=timeout, output_type=self.pytesseract.Output.DICT)
+        words = []
+        for index, text in enumerate(data['text']):
+            if not text.strip():
+                continue
+            word = {field: int(data[field][index]) for field in DATA_FIELDS}
+            word['text'] = text
+            word['conf'] = float(data['conf'][index])
+            words.append(word)
+        return words
+
+
+class TesserocrEngine:
+    """Persistent in-process Tesseract: traineddata is loaded once and numpy buffers are
+    passed straight to the API, with no temp files or subprocesses.
+
+    A TessBaseAPI handle is not thread-safe; use get_engine() for one instance per thread.
+    A timeout (in seconds) is enforced by Tesseract's own recognition monitor.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, config):
+        import tesserocr  # In-process Tesseract bindings (optional)
+        self.config = config
+        lang, psm, oem, variables = parse_tesseract_config(config)
+        self.default_psm = psm
+        self.api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=oem)
+        for name, value in variables.items():
+            self.api.SetVariable(name, value)
+
+    def _set_image(self, image):
+        if isinstance(image, np.ndarray):
+            buffer = np.ascontiguousarray(image)
+            height, width = buffer.shape[:2]
+            bytes_per_pixel = 1 if buffer.ndim == 2 else buffer.shape[2]
+            self.api.SetImageBytes(buffer.tobytes(), width, height, bytes_per_pixel,
+                                   width * bytes_per_pixel)
+        else:
+            self.api.SetImage(image)
+
+    def _recognize(self, timeout):
+        # Recognize() returns False when Tesseract gives up at the monitor deadline
+        if not self.api.Recognize(max(1, int(timeout * 1000)) if timeout else 0) and timeout:
+            raise OCRTimeoutError(f"Tesseract timed out after {timeout:.1f}s")
+
+    def image_to_string(self, image, timeout=0):
+        self._set_image(image)
+        self._recognize(timeout)
+        return self.api.GetUTF8Text()
+
+    def image_to_data(self, image, config=None, timeout=0):
+        """Word boxes and confidences as a list of dicts (text, conf, left, top, ...)."""
+        psm = parse_tesseract_config(config)[1] if config else self.default_psm
+        self.api.SetPageSegMode(psm)
+        try:
+            self._set_image(image)
+            self._recognize(timeout)
+            tsv = self.api.GetTSVText(0)
+        finally:
+            self.api.SetPageSegMode(self.default_psm)
+
+        words = []
+        # Columns: level page block par line word left top width height conf text
+        for row in tsv.splitlines():
+            columns = row.split('\t')
+            if len(columns) < 12 or columns[0] != '5' or not columns[11].strip():
+                continue
+            word = dict(zip(DATA_FIELDS, (int(value) for value in columns[2:10])))
+            word['conf'] = float(columns[10])
+            word['text'] = columns[11]
+            words.append(word)
+        return words
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+_local = threading.local()
+
+
+def resolve_engine_name(name='auto'):
+    """Map 'auto' to the persistent engine when available, otherwise pytesseract."""
+    if name == 'auto':
+        return TesserocrEngine.name if TESSEROCR_AVAILABLE else PytesseractEngine.name
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}' (choose from: auto, {', '.join(ENGINES)})")
+    return name
+
+
+def get_engine(name, config):
+    """Return this thread's engine for (name, config), creating it on first use."""
+    name = resolve_engine_name(name)
+    engines = getattr(_local, 'engines', None)
+    if engines is None:
+        engines = _local.engines = {}
+
+    key = (name, config)
+    if key not in engines:
+        try:
+            engines[key] = ENGINES[name](config)
+        except Exception as e:
+            if name == PytesseractEngine.name:
+                raise
+            # Fall back to the subprocess engine if the persistent one cannot start
+            print(f"⚠️  {name} engine unavailable ({e}); falling back to pytesseract")
+            engines[key] = PytesseractEngine(config)
+    return engines[key]
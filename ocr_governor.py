@@ -0,0 +1,208 @@
+import os
+import time
+import fcntl
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from ocr_metrics import ENABLED, ADMISSION_WAIT, ADMISSION_WAITING, ADMISSION_REJECTED, LIMITS_HIT
+
+
+class AdmissionRejected(Exception):
+    """Raised when a document cannot get an OCR slot: the wait queue is full or the wait timed out."""
+
+    def __init__(self, message, reason, retry_after=5):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps how many documents run the OCR pipeline at once.
+
+    Up to max_in_flight documents are admitted. Up to max_waiting more wait, for at most
+    max_wait seconds, for a slot to free up; anything beyond that is rejected immediately
+    so clients back off (HTTP 429) instead of piling up.
+
+    Without lock_dir the limits apply to this process only. With lock_dir they are shared
+    by every process using that directory (gunicorn or werkzeug workers): holding a slot
+    or a wait place means holding an flock() on one of its files, which the kernel drops
+    when the holder exits, so a crashed worker never leaks a slot. Waiters in one process
+    are served in arrival order; across processes a freed slot goes to the first waiter
+    that polls for it.
+    """
+
+    def __init__(self, max_in_flight=2, max_waiting=8, max_wait=30.0, lock_dir=None,
+                 poll_interval=0.05):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_waiting = max(0, int(max_waiting))
+        self.max_wait = max_wait
+        self.lock_dir = lock_dir
+        self.poll_interval = poll_interval
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiters = deque()
+        self.rejected = 0
+
+    @contextmanager
+    def admit(self, endpoint, block=False):
+        """Hold an OCR slot for the duration of the with block.
+
+        Raises AdmissionRejected when no slot is available in time. block=True waits as
+        long as it takes and bypasses the wait queue cap, for callers that are already
+        bounded on their own (background job workers).
+        """
+        slot = self._acquire(endpoint, block)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._release(slot)
+                self._condition.notify_all()
+
+    def _acquire(self, endpoint, block):
+        started = time.monotonic()
+        with self._condition:
+            if not self._waiters:
+                slot = self._take_slot()
+                if slot is not None:
+                    self._observe_wait(endpoint, 0.0)
+                    return slot
+
+            wait_place = None
+            if not block:
+                wait_place = self._take_wait_place()
+                if wait_place is None:
+                    self._reject(endpoint, 'queue_full')
+                    raise AdmissionRejected(f"Server busy: {self.max_in_flight} documents in progress "
+                                            f"and {self.max_waiting} waiting", 'queue_full')
+
+            ticket = object()
+            self._waiters.append(ticket)
+            if ENABLED:
+                ADMISSION_WAITING.inc()
+            try:
+                # First come, first served: only the head of the queue takes a free slot
+                while True:
+                    if self._waiters[0] is ticket:
+                        slot = self._take_slot()
+                        if slot is not None:
+                            break
+                    remaining = None if block else started + self.max_wait - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._reject(endpoint, 'wait_timeout')
+                        raise AdmissionRejected(f"Server busy: no OCR slot freed up within "
+                                                f"{self.max_wait:g}s", 'wait_timeout')
+                    if self.lock_dir:
+                        # Slots freed by other processes send no notification
+                        remaining = min(remaining or self.poll_interval, self.poll_interval)
+                    self._condition.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                self._release(wait_place)
+                if ENABLED:
+                    ADMISSION_WAITING.dec()
+                # The head of the queue changed; let the next waiter re-check
+                self._condition.notify_all()
+        self._observe_wait(endpoint, time.monotonic() - started)
+        return slot
+
+    def _take_slot(self):
+        """Take a free slot; its lock file descriptor (-1 without lock_dir), or None."""
+        if self.lock_dir:
+            slot = self._lock_any('slot', self.max_in_flight)
+        else:
+            slot = -1 if self._in_flight < self.max_in_flight else None
+        if slot is not None:
+            self._in_flight += 1
+        return slot
+
+    def _take_wait_place(self):
+        """Take a place in the wait queue; its lock file descriptor (-1 without lock_dir), or None."""
+        if self.lock_dir:
+            return self._lock_any('wait', self.max_waiting)
+        return -1 if len(self._waiters) < self.max_waiting else None
+
+    def _lock_any(self, kind, count):
+        """flock() the first free one of count lock files without blocking; its descriptor or None."""
+        for index in range(count):
+            fd = os.open(os.path.join(self.lock_dir, f'{kind}-{index}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def _release(self, fd):
+        # Closing the descriptor releases its flock()
+        if fd is not None and fd >= 0:
+            os.close(fd)
+
+    def _observe_wait(self, endpoint, seconds):
+        if ENABLED:
+            ADMISSION_WAIT.observe(seconds, endpoint=endpoint)
+
+    def _reject(self, endpoint, reason):
+        self.rejected += 1
+        if ENABLED:
+            ADMISSION_REJECTED.inc(endpoint=endpoint, reason=reason)
+
+    def stats(self):
+        """Slot usage of this process and the limits (shared across processes with lock_dir)."""
+        with self._condition:
+            return {
+                'in_flight': self._in_flight,
+                'waiting': len(self._waiters),
+                'rejected': self.rejected,
+                'max_in_flight': self.max_in_flight,
+                'max_waiting': self.max_waiting,
+                'shared': bool(self.lock_dir),
+            }
+
+
+class DocumentBudget:
+    """Resource limits for processing one document; a limit of 0 is disabled.
+
+    max_pages caps the pages read, max_pixels the total pixels rasterized for OCR and
+    max_page_pixels the size of any single page; deadline is a wall-clock budget in
+    seconds, counted from creation. Work stops at the first exhausted limit, which is
+    recorded in limits_hit and makes the result 'partial' rather than 'complete'.
+    """
+
+    def __init__(self, max_pages=0, max_pixels=0, max_page_pixels=0, deadline=0):
+        self.max_pages = max_pages
+        self.max_pixels = max_pixels
+        self.max_page_pixels = max_page_pixels
+        self.deadline = deadline
+        self.expires_at = time.monotonic() + deadline if deadline else None
+        self.pixels = 0
+        self.limits_hit = []
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def hit(self, limit):
+        """Record that a limit (page_budget, pixel_budget, page_pixels, page_timeout, deadline) was hit."""
+        if limit not in self.limits_hit:
+            self.limits_hit.append(limit)
+            if ENABLED:
+                LIMITS_HIT.inc(limit=limit)
+
+    @property
+    def status(self):
+        return 'partial' if self.limits_hit else 'complete'
+
+    def summary(self):
+        """Status, limits hit and pixels used, for processing_info."""
+        return {'status': self.status, 'limits_hit': list(self.limits_hit), 'pixels': self.pixels}
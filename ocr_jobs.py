@@ -0,0 +1,205 @@
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+
+class JobQueue:
+    """SQLite-backed job queue served by a bounded pool of background worker threads.
+
+    handler(file_path, filename) runs the document pipeline and returns a JSON-serializable
+    dict; a dict containing an 'error' key marks the job as failed.
+
+    Worker threads claim queued jobs from the database atomically, so several processes
+    (e.g. preforked server workers) can share one database without running a job twice.
+    Submissions in this process wake its threads immediately; jobs submitted elsewhere
+    are picked up within poll_interval seconds.
+
+    Threads only run after an explicit start(), so a process that merely submits jobs
+    (e.g. a forked per-request server child that exits after responding) never claims
+    one and leaves it stuck in 'running'.
+    """
+
+    def __init__(self, handler, db_path='jobs.db', workers=2, max_queue=20, poll_interval=1.0):
+        self.handler = handler
+        self.db_path = db_path
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.poll_interval = poll_interval
+        self._wakeup = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    file_path TEXT,
+                    status TEXT,
+                    error TEXT,
+                    result TEXT,
+                    submitted_at REAL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _autocommit_connect(self):
+        conn = self._connect()
+        # Explicit BEGIN IMMEDIATE / COMMIT instead of sqlite3's implicit transactions
+        conn.isolation_level = None
+        return conn
+
+    @staticmethod
+    def _queued_count(conn):
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def recover(self):
+        """Requeue jobs left running by a previous run.
+
+        Only call this while no other process is working on the database, e.g. in a
+        server's parent process before it forks workers.
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL "
+                         "WHERE status = 'running'")
+
+    def start(self, recover=True):
+        """Start the worker threads, first requeueing unfinished jobs unless recover=False."""
+        with self._lock:
+            if self._threads:
+                return
+            if recover:
+                self.recover()
+
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ocr-job-worker-{index}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, file_path, filename):
+        """Queue a saved upload for processing and return its job id."""
+        job_id = uuid.uuid4().hex
+        conn = self._autocommit_connect()
+        try:
+            # The write lock makes the depth check and insert atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            if self._queued_count(conn) >= self.max_queue:
+                conn.execute("ROLLBACK")
+                raise QueueFullError(f"Job queue is full ({self.max_queue} jobs waiting)")
+            conn.execute(
+                "INSERT INTO jobs (id, filename, file_path, status, submitted_at) "
+                "VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, filename, file_path, time.time())
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        self._wakeup.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Return the job's status, timings and (when done) result, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, filename, status, error, result, submitted_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        _, filename, status, error, result, submitted_at, started_at, finished_at = row
+        now = time.time()
+        job = {
+            'job_id': job_id,
+            'filename': filename,
+            'status': status,
+            'timings': {
+                'queued_seconds': round((started_at or now) - submitted_at, 3),
+                'running_seconds': round((finished_at or now) - started_at, 3) if started_at else 0.0,
+                'total_seconds': round((finished_at or now) - submitted_at, 3),
+            },
+        }
+        if status == 'queued':
+            with self._connect() as conn:
+                job['queue_depth'] = self._queued_count(conn)
+        if error:
+            job['error'] = error
+        if result:
+            job['result'] = json.loads(result)
+        return job
+
+    def stats(self):
+        """Job counts by status plus current queue depth."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {'queue_depth': counts.get('queued', 0), 'max_queue': self.max_queue,
+                'workers': self.workers, 'jobs': counts}
+
+    def _work(self):
+        while True:
+            try:
+                self._wakeup.get(timeout=self.poll_interval)
+            except queue.Empty:
+                pass
+            # Drain everything queued, including jobs submitted by other processes
+            try:
+                while self._claim_and_run():
+                    pass
+            except sqlite3.Error as e:
+                print(f"⚠️  Job queue database error: {e}")
+
+    def _claim(self):
+        """Atomically mark the oldest queued job as running; returns (id, path, filename) or None."""
+        conn = self._autocommit_connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id, file_path, filename FROM jobs WHERE status = 'queued' "
+                               "ORDER BY submitted_at LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                             (time.time(), row[0]))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return row
+
+    def _claim_and_run(self):
+        row = self._claim()
+        if row is None:
+            return False
+        self._run(*row)
+        return True
+
+    def _run(self, job_id, file_path, filename):
+        try:
+            result = self.handler(file_path, filename)
+        except Exception as e:
+            self._mark_finished(job_id, 'failed', error=str(e))
+            return
+
+        if result.get('error'):
+            self._mark_finished(job_id, 'failed', error=result['error'])
+        else:
+            self._mark_finished(job_id, 'done', result=result)
+
+    def _mark_finished(self, job_id, status, error=None, result=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, finished_at = ? WHERE id = ?",
+                (status, error, json.dumps(result, ensure_ascii=False) if result else None,
+                 time.time(), job_id)
+            )
+
@@ -0,0 +1,261 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Set OCR_METRICS=0 to turn every hook into a shared no-op
+ENABLED = os.environ.get('OCR_METRICS', '1') != '0'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+class _Metric:
+    def __init__(self, name, help_text, metric_type):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text, 'counter')
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text, 'gauge')
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, 'histogram')
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for key, series in self._values.items():
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', bound))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, *args)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram('ocr_stage_duration_seconds',
+                                    'Time spent in each OCR pipeline stage')
+REQUEST_DURATION = registry.histogram('ocr_request_duration_seconds',
+                                      'End-to-end document processing time')
+REQUESTS_TOTAL = registry.counter('ocr_requests_total', 'Documents processed, by endpoint and status')
+REQUESTS_IN_FLIGHT = registry.gauge('ocr_requests_in_flight', 'Documents currently being processed')
+PAGES_TOTAL = registry.counter('ocr_pages_processed_total', 'Pages processed, by source')
+STARTUP_SECONDS = registry.gauge('ocr_startup_seconds', 'Server import and warmup time, by phase')
+ADMISSION_WAIT = registry.histogram('ocr_admission_wait_seconds',
+                                    'Time documents waited for an OCR slot, by endpoint')
+ADMISSION_WAITING = registry.gauge('ocr_admission_waiting', 'Documents waiting for an OCR slot')
+ADMISSION_REJECTED = registry.counter('ocr_admission_rejected_total',
+                                      'Documents turned away by admission control, by endpoint and reason')
+LIMITS_HIT = registry.counter('ocr_limits_hit_total',
+                              'Documents cut short by a resource limit, by limit')
+RENDER_DPI = registry.histogram('ocr_render_dpi', 'DPI chosen per page in adaptive DPI mode',
+                                buckets=(150, 175, 200, 225, 250, 275, 300, 350, 400))
+
+# Per-request stage durations, collected for processing_info
+_request_timings = contextvars.ContextVar('ocr_request_timings', default=None)
+
+
+class _NullStage:
+    """Shared no-op context manager returned when metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def stage(name):
+    """Context manager timing one pipeline stage: `with stage('tesseract'): ...`."""
+    if not ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def record_stage(name, seconds):
+    """Record a stage duration measured elsewhere (e.g. in a worker process)."""
+    if not ENABLED:
+        return
+    STAGE_DURATION.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def count_page(source):
+    """Count one processed page by where its text came from (ocr, text_layer, cache)."""
+    if ENABLED:
+        PAGES_TOTAL.inc(source=source)
+
+
+def record_render_dpi(dpi):
+    """Record the render DPI adaptive mode picked for one page."""
+    if ENABLED:
+        RENDER_DPI.observe(dpi)
+
+
+@contextmanager
+def collect_timings():
+    """Collect the stage durations recorded in this context into a dict of seconds."""
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+@contextmanager
+def track_request(endpoint):
+    """Track one document request: in-flight gauge, total duration, status and stage timings.
+
+    Yields a RequestTracker; the outcome is labelled 'ok' unless the caller sets another
+    status with tracker.set_status() or an exception escapes ('error').
+    """
+    status = {'value': 'ok'}
+    started = time.perf_counter()
+    if ENABLED:
+        REQUESTS_IN_FLIGHT.inc()
+    try:
+        with collect_timings() as timings:
+            yield RequestTracker(timings, status)
+    except Exception:
+        status['value'] = 'error'
+        raise
+    finally:
+        if ENABLED:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+            REQUESTS_TOTAL.inc(endpoint=endpoint, status=status['value'])
+
+
+class RequestTracker:
+    """Handle yielded by track_request."""
+
+    def __init__(self, timings, status):
+        self.timings = timings
+        self._status = status
+        self.started = time.perf_counter()
+
+    def set_status(self, value):
+        self._status['value'] = value
+
+    def summary(self):
+        """Rounded per-stage durations plus the elapsed time so far, for processing_info."""
+        return {
+            'stage_timings': {name: round(seconds, 4) for name, seconds in self.timings.items()},
+            'processing_seconds': round(time.perf_counter() - self.started, 4),
+        }
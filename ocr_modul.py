@@ -1,17 +1,36 @@
 import os
 import re
-import pandas as pd
+import math
 import numpy as np
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import json
+import subprocess
+import tempfile
+import threading
+import multiprocessing
+import time
+import uuid
 from datetime import datetime
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 # OCR-related libraries
 from PIL import Image, ImageEnhance, ImageFilter
 import cv2  # OpenCV for computer vision and image manipulation
-import pytesseract  # Python wrapper for Tesseract OCR engine
-from pdf2image import convert_from_path  # Convert PDF pages to images
+from pdf2image import (convert_from_path, convert_from_bytes,  # Convert PDF pages to images
+                       pdfinfo_from_path, pdfinfo_from_bytes)
+
+from ocr_cache import OCRResultCache
+from ocr_engine import get_engine, resolve_engine_name, OCRTimeoutError
+from ocr_jobs import JobQueue, QueueFullError
+from ocr_uploads import UploadStore
+from ocr_regions import RegionOCRCache, segment_regions
+from ocr_store import ResultStore, iter_chunks, iter_decompressed
+from ocr_governor import AdmissionController, AdmissionRejected, DocumentBudget
+from ocr_metrics import (registry as metrics_registry, stage, record_stage, count_page,
+                         record_render_dpi, collect_timings, track_request)
 
 app = Flask(__name__)
 
@@ -19,80 +38,1086 @@ UPLOAD_FOLDER = 'uploads'
 PROCESSED_FOLDER = 'processed'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
+# Number of OCR worker processes per document (1 = sequential)
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', 1))
+# OCR backend: 'auto' (persistent tesserocr when installed), 'tesserocr' or 'pytesseract'
+app.config['OCR_ENGINE'] = os.environ.get('OCR_ENGINE', 'auto')
+# 'standard' (full pipeline on every page) or 'selective' (cheap pass + re-OCR of low-confidence lines)
+app.config['OCR_MODE'] = os.environ.get('OCR_MODE', 'standard')
+# 'fixed' (every page at 300 DPI) or 'adaptive' (per-page DPI from the text size in a preview)
+app.config['OCR_DPI_MODE'] = os.environ.get('OCR_DPI_MODE', 'fixed')
+# Take text straight from a PDF's embedded text layer instead of OCRing the page (set
+# OCR_TEXT_LAYER=0 to OCR every page); column gaps become '|' like OCR'd table borders
+app.config['OCR_TEXT_LAYER'] = os.environ.get('OCR_TEXT_LAYER', '1') == '1'
+# Content-addressed OCR result cache (set OCR_CACHE_MAX_BYTES=0 to disable)
+app.config['OCR_CACHE_DIR'] = os.environ.get('OCR_CACHE_DIR', 'ocr_cache')
+app.config['OCR_CACHE_MAX_BYTES'] = int(os.environ.get('OCR_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# In-memory cache of OCR text for recurring header regions (letterheads); 0 disables it
+app.config['OCR_REGION_CACHE_MAX_BYTES'] = int(os.environ.get('OCR_REGION_CACHE_MAX_BYTES', 0))
+# Background job queue for /api/jobs
+app.config['JOB_DB_PATH'] = os.environ.get('JOB_DB_PATH', 'jobs.db')
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_QUEUE'] = int(os.environ.get('JOB_MAX_QUEUE', 20))
+# Indexed store of processed documents (main fields, items, full page text)
+app.config['RESULT_DB_PATH'] = os.environ.get('RESULT_DB_PATH', 'results.db')
+# Uploads are processed in memory and spooled to a temp file above this size
+app.config['UPLOAD_SPOOL_THRESHOLD'] = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 8 * 1024 * 1024))
+# Opt-in retention of original uploads, capped by total size (oldest evicted first)
+app.config['UPLOAD_RETENTION'] = os.environ.get('UPLOAD_RETENTION', '0') == '1'
+app.config['UPLOAD_RETENTION_DIR'] = os.environ.get('UPLOAD_RETENTION_DIR',
+                                                    os.path.join(UPLOAD_FOLDER, 'retained'))
+app.config['UPLOAD_RETENTION_MAX_BYTES'] = int(os.environ.get('UPLOAD_RETENTION_MAX_BYTES',
+                                                              1024 * 1024 * 1024))
+# Admission control: documents OCRed at once, and how many may wait how long for a slot.
+# The limits are shared by all server worker processes through lock files in
+# OCR_ADMISSION_DIR; set it to '' to apply them per process instead
+app.config['OCR_MAX_IN_FLIGHT'] = int(os.environ.get('OCR_MAX_IN_FLIGHT', 2))
+app.config['OCR_MAX_WAITING'] = int(os.environ.get('OCR_MAX_WAITING', 8))
+app.config['OCR_MAX_QUEUE_WAIT'] = float(os.environ.get('OCR_MAX_QUEUE_WAIT', 30))
+app.config['OCR_ADMISSION_DIR'] = os.environ.get('OCR_ADMISSION_DIR', 'ocr_admission')
+# Per-document budgets (0 disables): pages read, pixels rasterized in total (~57 A4 pages at
+# 300 DPI) and per page (just above A2); adaptive DPI mode counts pages at its 400 DPI maximum
+app.config['OCR_MAX_PAGES'] = int(os.environ.get('OCR_MAX_PAGES', 100))
+app.config['OCR_MAX_PIXELS'] = int(os.environ.get('OCR_MAX_PIXELS', 500 * 1000 * 1000))
+app.config['OCR_MAX_PAGE_PIXELS'] = int(os.environ.get('OCR_MAX_PAGE_PIXELS', 36 * 1000 * 1000))
+# Seconds of OCR per page, and per document before partial results are returned; keep the
+# deadline below the server's worker timeout (OCR_SERVER_TIMEOUT)
+app.config['OCR_PAGE_TIMEOUT'] = float(os.environ.get('OCR_PAGE_TIMEOUT', 60))
+app.config['OCR_REQUEST_DEADLINE'] = float(os.environ.get('OCR_REQUEST_DEADLINE', 240))
+
+# Bump whenever enhance_image or normalize_layout_text changes so stale cache entries are not reused
+PREPROCESSING_VERSION = 3
+
+# pdfinfo page size entries ("Page    3 size: 595.28 x 841.89 pts (A4)"), for pixel budgets
+PAGE_SIZE_KEY_PATTERN = re.compile(r'Page\s+(\d+) size$')
+PAGE_SIZE_PATTERN = re.compile(r'([\d.]+) x ([\d.]+) pts')
+
+DPI_MODES = ('fixed', 'adaptive')
+
+# Column gaps in pdftotext -layout output (two or more spaces between words)
+LAYOUT_COLUMN_GAP = re.compile(r'[ \t]{2,}')
+
+def normalize_layout_text(text):
+    """Rewrite pdftotext -layout text into the shape Tesseract gives the same page.
+    
+    OCR reads table borders as '|' between cells ('Supplier | NEW MASSA MOTOR'), while the
+    layout output separates columns with runs of spaces. Each column gap becomes ' | ',
+    and indentation and trailing spaces are dropped, so the field patterns and the item
+    parser see the same separators for both sources.
+    """
+    lines = (LAYOUT_COLUMN_GAP.sub(' | ', line.strip()) for line in text.split('\n'))
+    return '\n'.join(lines)
 
 # Create necessary directories
 for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER]:
     if not os.path.exists(folder):
         os.makedirs(folder)
 
+ocr_cache = None
+if app.config['OCR_CACHE_MAX_BYTES'] > 0:
+    ocr_cache = OCRResultCache(app.config['OCR_CACHE_DIR'], app.config['OCR_CACHE_MAX_BYTES'])
+
+result_store = ResultStore(app.config['RESULT_DB_PATH'])
+
+region_cache = None
+if app.config['OCR_REGION_CACHE_MAX_BYTES'] > 0:
+    region_cache = RegionOCRCache(app.config['OCR_REGION_CACHE_MAX_BYTES'])
+
+# Point-in-time gauges refreshed on each /metrics scrape
+CACHE_GAUGE = metrics_registry.gauge('ocr_cache', 'OCR result cache hits, misses and size in bytes')
+REGION_CACHE_GAUGE = metrics_registry.gauge('ocr_region_cache',
+                                           'Header region OCR cache hits, misses, entries and bytes')
+JOB_QUEUE_GAUGE = metrics_registry.gauge('ocr_job_queue', 'Background job queue depth and jobs by status')
+
+admission = AdmissionController(max_in_flight=app.config['OCR_MAX_IN_FLIGHT'],
+                                max_waiting=app.config['OCR_MAX_WAITING'],
+                                max_wait=app.config['OCR_MAX_QUEUE_WAIT'],
+                                lock_dir=app.config['OCR_ADMISSION_DIR'] or None)
+
+upload_store = UploadStore(spool_threshold=app.config['UPLOAD_SPOOL_THRESHOLD'],
+                           retain=app.config['UPLOAD_RETENTION'],
+                           retention_dir=app.config['UPLOAD_RETENTION_DIR'],
+                           retention_max_bytes=app.config['UPLOAD_RETENTION_MAX_BYTES'])
+
+def convert_pdf(source, **kwargs):
+    """Rasterize a PDF given as a file path or as its bytes."""
+    if isinstance(source, bytes):
+        return convert_from_bytes(source, **kwargs)
+    return convert_from_path(source, **kwargs)
+
+@contextmanager
+def spooled_pdf(source):
+    """Yield a file path for a PDF source; PDF bytes are written to one temp file for the duration."""
+    if not isinstance(source, bytes):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(source)
+        yield path
+    finally:
+        os.remove(path)
+
+def source_label(source):
+    """Short description of a PDF source for log messages."""
+    return f"<upload, {len(source)} bytes>" if isinstance(source, bytes) else source
+
+def page_render_info(page):
+    """Render DPI, x-height and estimated speedup of an adaptive-DPI page, or None."""
+    if not page.get("render"):
+        return None
+    return {"page": page["page"], **page["render"]}
+
+class ImagePreprocessor:
+    """Grayscale OCR preprocessing that reuses CLAHE/kernel objects and frame buffers across pages.
+    
+    Produces the same steps as the original enhance_image (upscale, median blur, CLAHE,
+    Otsu, morphological close) but converts to grayscale first, so the cubic resize and
+    every later step work on one channel, and writes into preallocated buffers.
+    """
+    
+    def __init__(self, min_width=1800):
+        self.min_width = min_width
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        self.kernel = np.ones((2,2), np.uint8)
+        # Buffers for the most recent frame size; pages of one document share a size
+        self._shape = None
+        self._buffers = None
+    
+    def to_gray(self, image):
+        """Single-channel uint8 view of a PIL image or numpy array."""
+        if isinstance(image, Image.Image):
+            if image.mode == 'L':
+                return np.asarray(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+        if image.ndim == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    
+    def _buffers_for(self, shape):
+        if shape != self._shape:
+            self._shape = shape
+            self._buffers = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+        return self._buffers
+    
+    def process(self, image, scale=None):
+        """Run the preprocessing pipeline; the result is a buffer reused by the next call."""
+        gray = self.to_gray(image)
+        
+        # 1. Resize after dropping colour (if too small)
+        height, width = gray.shape
+        scale_factor = scale
+        if scale_factor is None and width < self.min_width:  # Scale up small images
+            scale_factor = self.min_width / width
+        if scale_factor and scale_factor != 1:
+            gray = cv2.resize(gray, (int(width * scale_factor), int(height * scale_factor)),
+                              interpolation=cv2.INTER_CUBIC)
+        
+        front, back = self._buffers_for(gray.shape)
+        
+        # 2. Noise reduction
+        cv2.medianBlur(gray, 3, dst=front)
+        
+        # 3. Contrast enhancement using CLAHE
+        self.clahe.apply(front, dst=back)
+        
+        # 4. Binary thresholding with Otsu's method, in place
+        cv2.threshold(back, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=back)
+        
+        # 5. Morphological operations to clean up the image
+        cv2.morphologyEx(back, cv2.MORPH_CLOSE, self.kernel, dst=front)
+        
+        return front
+
 class EnhancedOCRProcessor:
     """Enhanced OCR processor with better preprocessing and data extraction."""
     
-    def __init__(self):
+    def __init__(self, dpi=300, page_window=1, workers=1, omp_threads=1, cache=None,
+                 use_text_layer=True, text_layer_min_chars=25, engine='auto',
+                 ocr_mode='standard', confidence_threshold=60, reocr_scale=2.0, grayscale=True,
+                 region_cache=None, region_header_fraction=0.4, page_timeout=0,
+                 dpi_mode='fixed', preview_dpi=100, target_x_height=20, min_dpi=150, max_dpi=400):
         # Configure Tesseract OCR settings
         self.tesseract_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,:|/\-+()[] '
+        # Rasterization settings; page_window bounds how many pages are held in memory at once
+        self.dpi = dpi
+        self.page_window = max(1, int(page_window))
+        # Adaptive mode renders each page at the lowest DPI (between min_dpi and max_dpi) that
+        # gives its text an x-height of target_x_height pixels, measured on a preview_dpi render
+        if dpi_mode not in DPI_MODES:
+            raise ValueError(f"Unknown DPI mode '{dpi_mode}' (choose from: {', '.join(DPI_MODES)})")
+        self.dpi_mode = dpi_mode
+        self.preview_dpi = preview_dpi
+        self.target_x_height = target_x_height
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.last_render = None
+        # Render straight to single-channel images; preprocessing never needs colour
+        self.grayscale = grayscale
+        self.preprocessor = ImagePreprocessor()
+        # Parallel settings; each worker process runs Tesseract with omp_threads OpenMP threads
+        self.workers = max(1, int(workers))
+        self.omp_threads = max(1, int(omp_threads))
+        # OCR backend, resolved once so cache keys and workers agree on it
+        self.engine_name = resolve_engine_name(engine)
+        # Digital PDFs: take the embedded text layer directly when a page has enough real text.
+        # Opt-in until the extractors handle pdftotext layout (no '|' column borders)
+        self.use_text_layer = use_text_layer
+        self.text_layer_min_chars = text_layer_min_chars
+        # Selective mode: lines whose mean word confidence is below the threshold are
+        # re-OCRed from a reocr_scale upscaled, fully enhanced crop
+        self.ocr_mode = ocr_mode
+        self.confidence_threshold = confidence_threshold
+        self.reocr_scale = reocr_scale
+        self.last_page_stats = None
+        # Optional OCRResultCache; cache_stats counts lookups made by this processor
+        self.cache = cache
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        # Optional RegionOCRCache: layout regions in the top region_header_fraction of a
+        # page are OCRed separately and reused across documents sharing a letterhead
+        self.region_cache = region_cache
+        self.region_header_fraction = region_header_fraction
+        # Seconds all Tesseract calls for one page may take together (0 = no limit)
+        self.page_timeout = page_timeout
+        self._page_deadline = None
+        
+    def enhance_image(self, image, scale=None):
+        """Apply advanced image enhancement techniques for better OCR accuracy.
+        
+        By default images narrower than 1800 px are scaled up to that width;
+        pass scale to resize by an explicit factor instead. The returned array is a
+        reused buffer that is only valid until the next call.
+        """
+        return self.preprocessor.process(image, scale)
+    
+    def count_pages(self, pdf_path):
+        """Return the number of pages in a PDF without rasterizing it."""
+        if isinstance(pdf_path, bytes):
+            info = pdfinfo_from_bytes(pdf_path)
+        else:
+            info = pdfinfo_from_path(pdf_path)
+        return int(info.get("Pages", 0))
+    
+    def page_pixels(self, pdf_path, first_page, last_page, dpi=None):
+        """Return {page_number: pixels} each page would have when rasterized at dpi
+        (default self.dpi).
+        
+        Computed from the page sizes pdfinfo reports, so nothing is rendered to find out.
+        """
+        dpi = dpi or self.dpi
+        kwargs = {'first_page': first_page, 'last_page': last_page, 'timeout': 60}
+        if isinstance(pdf_path, bytes):
+            info = pdfinfo_from_bytes(pdf_path, **kwargs)
+        else:
+            info = pdfinfo_from_path(pdf_path, **kwargs)
+        
+        pixels = {}
+        for key, value in info.items():
+            page = PAGE_SIZE_KEY_PATTERN.match(key)
+            size = PAGE_SIZE_PATTERN.match(str(value))
+            if page and size:
+                width, height = (float(points) / 72 * dpi for points in size.groups())
+                pixels[int(page.group(1))] = int(width) * int(height)
+        return pixels
+    
+    def plan_pixel_budget(self, pdf_path, page_numbers, budget):
+        """Apply the budget's pixel limits to the pages due for OCR, before rasterizing any.
+        
+        Returns (pages to OCR, {page_number: error} for oversized pages, stop page). Pages
+        above max_page_pixels are skipped; the first page that would take the document past
+        max_pixels is the stop page, and neither it nor any later page is read.
+        
+        Adaptive mode picks each page's DPI only when rendering it, so pages are budgeted at
+        max_dpi, the most any of them can cost.
+        """
+        dpi = self.max_dpi if self.dpi_mode == 'adaptive' else self.dpi
+        sizes = self.page_pixels(pdf_path, page_numbers[0], page_numbers[-1], dpi)
+        allowed, oversized = [], {}
+        for page_number in page_numbers:
+            pixels = sizes.get(page_number, 0)
+            if budget.max_page_pixels and pixels > budget.max_page_pixels:
+                budget.hit('page_pixels')
+                oversized[page_number] = (f"Page is {pixels:,} pixels at {dpi} DPI "
+                                          f"(limit {budget.max_page_pixels:,})")
+                continue
+            if budget.max_pixels and budget.pixels + pixels > budget.max_pixels:
+                budget.hit('pixel_budget')
+                return allowed, oversized, page_number
+            budget.pixels += pixels
+            allowed.append(page_number)
+        return allowed, oversized, None
+    
+    def iter_page_images(self, pdf_path, page_numbers):
+        """Rasterize the given pages a window at a time, yielding (page_number, image).
+        
+        The image is None for a page that could not be rendered.
+        """
+        if self.dpi_mode == 'adaptive':
+            # Every page gets its own DPI, so pages are rendered one at a time
+            for page_number in page_numbers:
+                yield page_number, self.render_page(pdf_path, page_number)
+            return
+        
+        page_numbers = list(page_numbers)
+        index = 0
+        while index < len(page_numbers):
+            # A window is a run of consecutive page numbers, at most page_window long
+            window_start = page_numbers[index]
+            window_size = 1
+            while (window_size < self.page_window and index + window_size < len(page_numbers)
+                   and page_numbers[index + window_size] == window_start + window_size):
+                window_size += 1
+            
+            with stage('rasterize'):
+                images = convert_pdf(pdf_path, dpi=self.dpi, fmt='PNG', grayscale=self.grayscale,
+                                     first_page=window_start,
+                                     last_page=window_start + window_size - 1,
+                                     timeout=self.page_timeout * window_size or None)
+            page_number = window_start
+            # Pop pages off the window so each image is released once it has been OCRed
+            while images:
+                yield page_number, images.pop(0)
+                page_number += 1
+            # Pages poppler did not render get None, so later pages keep their numbers
+            for page_number in range(page_number, window_start + window_size):
+                yield page_number, None
+            index += window_size
+    
+    def render_page(self, pdf_path, page_number):
+        """Rasterize one page at self.dpi, or at the page's own DPI in adaptive mode.
+        
+        In adaptive mode the chosen DPI, estimated x-height and speedup are left in
+        last_render for the page result. Returns None if poppler renders no image.
+        """
+        render = self.choose_dpi(pdf_path, page_number) if self.dpi_mode == 'adaptive' else None
+        dpi = render['dpi'] if render else self.dpi
+        with stage('rasterize'):
+            images = convert_pdf(pdf_path, dpi=dpi, fmt='PNG', grayscale=self.grayscale,
+                                 first_page=page_number, last_page=page_number,
+                                 timeout=self.page_timeout or None)
+        if not images:
+            self.last_render = None
+            return None
+        image = images[0]
+        if render:
+            render['speedup'] = self.estimate_speedup(image, dpi)
+        self.last_render = render
+        return image
+    
+    def choose_dpi(self, pdf_path, page_number):
+        """Pick a page's render DPI from a low-resolution preview.
+        
+        Returns {'dpi', 'x_height'}, with the x-height in pixels at the chosen DPI. Pages
+        without measurable text (blank, photos) keep the fixed DPI.
+        """
+        preview_dpi = self.preview_dpi
+        with stage('dpi_preview'):
+            x_height = self._preview_x_height(pdf_path, page_number, preview_dpi)
+            if x_height is not None and x_height < 8:
+                # Tiny print runs together at preview resolution; measure it again at twice the DPI
+                preview_dpi *= 2
+                x_height = self._preview_x_height(pdf_path, page_number, preview_dpi)
+        if x_height is None:
+            return {'dpi': self.dpi, 'x_height': None}
+        
+        # Lowest DPI reaching the target, rounded up to a multiple of 25 DPI
+        dpi = math.ceil(preview_dpi * self.target_x_height / x_height / 25) * 25
+        dpi = min(self.max_dpi, max(self.min_dpi, dpi))
+        return {'dpi': dpi, 'x_height': round(x_height * dpi / preview_dpi, 1)}
+    
+    def _preview_x_height(self, pdf_path, page_number, preview_dpi):
+        previews = convert_pdf(pdf_path, dpi=preview_dpi, fmt='PNG', grayscale=True,
+                               first_page=page_number, last_page=page_number,
+                               timeout=self.page_timeout or None)
+        if not previews:
+            return None
+        return self.estimate_x_height(self.preprocessor.to_gray(previews[0]))
+    
+    def estimate_x_height(self, gray, min_glyphs=20):
+        """Median height in pixels of glyph-sized connected components, or None without text.
+        
+        Components taller than 5% of the page, much wider than tall or under 3 px high
+        (table rules, logos, words merged at low resolution, dots and speckles) are ignored,
+        so the median follows the lowercase-heavy body text.
+        """
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        glyphs = (heights >= 3) & (heights <= gray.shape[0] * 0.05) & (widths <= heights * 2)
+        if np.count_nonzero(glyphs) < min_glyphs:
+            return None
+        return float(np.median(heights[glyphs]))
+    
+    def estimate_speedup(self, image, dpi):
+        """Pixels the fixed-DPI pipeline would OCR for this page (render plus upscale), divided
+        by the pixels OCRed at the adaptive DPI. Tesseract time grows roughly with pixel count.
+        """
+        width, height = image.width * self.dpi / dpi, image.height * self.dpi / dpi
+        if width < self.preprocessor.min_width:
+            height *= self.preprocessor.min_width / width
+            width = self.preprocessor.min_width
+        return round(width * height / (image.width * image.height), 2)
+    
+    def extract_text_layer(self, pdf_path, first_page, last_page):
+        """Return {page_number: text} for pages whose embedded text layer is usable.
+        
+        Uses poppler's pdftotext (installed alongside pdf2image), with the layout output
+        rewritten by normalize_layout_text. Pages without a usable text layer are left out,
+        and an empty dict is returned if pdftotext is unavailable. PDF bytes are piped to
+        pdftotext on stdin.
+        """
+        in_memory = isinstance(pdf_path, bytes)
+        try:
+            with stage('text_layer'):
+                output = subprocess.run(
+                    ['pdftotext', '-layout', '-enc', 'UTF-8',
+                     '-f', str(first_page), '-l', str(last_page),
+                     '-' if in_memory else pdf_path, '-'],
+                    input=pdf_path if in_memory else None,
+                    capture_output=True, check=True, timeout=60
+                ).stdout.decode('utf-8', errors='replace')
+        except (OSError, subprocess.SubprocessError):
+            return {}
+        
+        # pdftotext terminates every page with a form feed
+        page_texts = output.split('\f')
+        text_layer = {}
+        for offset, text in enumerate(page_texts[:last_page - first_page + 1]):
+            if self.has_usable_text(text):
+                text_layer[first_page + offset] = normalize_layout_text(text)
+        return text_layer
+    
+    def has_usable_text(self, text):
+        """Check whether an embedded text layer carries real content rather than noise."""
+        alnum_count = sum(1 for char in text if char.isalnum())
+        if alnum_count < self.text_layer_min_chars:
+            return False
+        # Broken font encodings come out as replacement characters
+        return text.count('\ufffd') <= 0.05 * alnum_count
+    
+    def get_engine(self):
+        """The OCR engine for the current thread; persistent engines are created once."""
+        return get_engine(self.engine_name, self.tesseract_config)
+    
+    def tesseract_timeout(self):
+        """Seconds left for Tesseract on the current page, or 0 when it is unlimited."""
+        if self._page_deadline is None:
+            return 0
+        remaining = self._page_deadline - time.monotonic()
+        if remaining <= 0:
+            raise OCRTimeoutError("Page OCR time limit reached")
+        return remaining
+    
+    def ocr_page(self, image, time_limit=None):
+        """Enhance a single page image and run Tesseract on it.
+        
+        All Tesseract calls for the page share page_timeout seconds, or time_limit if that
+        is shorter; OCRTimeoutError is raised when they run out.
+        """
+        limits = [limit for limit in (self.page_timeout or None, time_limit) if limit is not None]
+        self._page_deadline = time.monotonic() + min(limits) if limits else None
+        if self.ocr_mode == 'selective':
+            return self.ocr_page_selective(image)
+        
+        self.last_page_stats = None
+        with stage('preprocess'):
+            # Adaptive renders already have the intended text size; skip the width-based upscale
+            enhanced_image = self.enhance_image(image, scale=1.0 if self.dpi_mode == 'adaptive' else None)
+        if self.region_cache is not None:
+            return self.ocr_page_regions(enhanced_image)
+        with stage('tesseract'):
+            return self.get_engine().image_to_string(enhanced_image, timeout=self.tesseract_timeout())
+    
+    def ocr_page_regions(self, enhanced_image):
+        """OCR header regions one by one through the region cache, then the rest of the page.
         
-    def enhance_image(self, image):
-        """Apply advanced image enhancement techniques for better OCR accuracy."""
-        # Convert PIL to OpenCV format
-        img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        Only regions whose pixels match a cached region are skipped; variable regions
+        (PO number, date) and everything below the header are OCRed as usual.
+        """
+        engine = self.get_engine()
+        header_limit = int(enhanced_image.shape[0] * self.region_header_fraction)
+        stats = {'regions': 0, 'region_hits': 0}
+        texts = []
+        body_top = None
         
-        # 1. Resize image for better OCR (if too small)
-        height, width = img_cv.shape[:2]
-        if width < 1800:  # Scale up small images
-            scale_factor = 1800 / width
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            img_cv = cv2.resize(img_cv, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+        for top, bottom in segment_regions(enhanced_image):
+            if top >= header_limit:
+                body_top = top
+                break
+            region = enhanced_image[top:bottom]
+            stats['regions'] += 1
+            text, token = self.region_cache.lookup(region)
+            if text is None:
+                with stage('tesseract'):
+                    text = engine.image_to_string(region, timeout=self.tesseract_timeout())
+                self.region_cache.store(token, text)
+            else:
+                stats['region_hits'] += 1
+            texts.append(text)
         
-        # 2. Convert to grayscale
-        gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+        if body_top is not None:
+            with stage('tesseract'):
+                texts.append(engine.image_to_string(enhanced_image[body_top:],
+                                                    timeout=self.tesseract_timeout()))
         
-        # 3. Noise reduction
-        denoised = cv2.medianBlur(gray, 3)
+        self.last_page_stats = stats
+        return '\n'.join(text.strip('\n\f') for text in texts)
+    
+    def ocr_page_selective(self, image):
+        """Cheap first pass with word confidences, then re-OCR only the low-confidence lines."""
+        engine = self.get_engine()
+        
+        # First pass: Otsu binarization at render resolution, no upscale/CLAHE/morphology
+        with stage('preprocess'):
+            gray = self.preprocessor.to_gray(image)
+            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        with stage('tesseract'):
+            lines = self.group_words_into_lines(engine.image_to_data(binary,
+                                                                     timeout=self.tesseract_timeout()))
+        del gray, binary
+        
+        line_config = re.sub(r'--psm\s+\d+', '--psm 7', self.tesseract_config)
+        stats = {'lines': len(lines), 'reocr_lines': 0, 'improved_lines': 0}
+        page_height, page_width = image.height, image.width
+        
+        line_texts = []
+        for line in lines:
+            if line['conf'] >= self.confidence_threshold:
+                line_texts.append(line['text'])
+                continue
+            
+            # Re-OCR just this line from a padded, upscaled and fully enhanced crop
+            stats['reocr_lines'] += 1
+            pad = max(4, line['height'] // 2)
+            box = (max(0, line['left'] - pad), max(0, line['top'] - pad),
+                   min(page_width, line['right'] + pad), min(page_height, line['bottom'] + pad))
+            with stage('preprocess'):
+                crop = self.enhance_image(image.crop(box), scale=self.reocr_scale)
+            with stage('tesseract'):
+                words = engine.image_to_data(crop, config=line_config, timeout=self.tesseract_timeout())
+            confident = [word['conf'] for word in words if word['conf'] >= 0]
+            reocr_conf = sum(confident) / len(confident) if confident else -1
+            
+            if words and reocr_conf > line['conf']:
+                stats['improved_lines'] += 1
+                line_texts.append(' '.join(word['text'] for word in words))
+            else:
+                line_texts.append(line['text'])
+        
+        self.last_page_stats = stats
+        return '\n'.join(line_texts) + '\n'
+    
+    def group_words_into_lines(self, words):
+        """Group image_to_data words into lines with a bounding box and mean confidence."""
+        lines = {}
+        for word in words:
+            key = (word['block_num'], word['par_num'], word['line_num'])
+            line = lines.get(key)
+            if line is None:
+                line = lines[key] = {'words': [], 'confs': [],
+                                     'left': word['left'], 'top': word['top'],
+                                     'right': word['left'] + word['width'],
+                                     'bottom': word['top'] + word['height']}
+            line['words'].append(word['text'])
+            if word['conf'] >= 0:
+                line['confs'].append(word['conf'])
+            line['left'] = min(line['left'], word['left'])
+            line['top'] = min(line['top'], word['top'])
+            line['right'] = max(line['right'], word['left'] + word['width'])
+            line['bottom'] = max(line['bottom'], word['top'] + word['height'])
+        
+        grouped = []
+        for line in lines.values():
+            grouped.append({
+                'text': ' '.join(line['words']),
+                'conf': sum(line['confs']) / len(line['confs']) if line['confs'] else -1,
+                'left': line['left'], 'top': line['top'],
+                'right': line['right'], 'bottom': line['bottom'],
+                'height': line['bottom'] - line['top'],
+            })
+        return grouped
+    
+    def process_page(self, pdf_path, page_number, time_limit=None):
+        """Rasterize and OCR a single page, isolating any error to that page.
+        
+        time_limit, when shorter than page_timeout, caps the page's OCR time (see ocr_page).
+        Stage durations measured here are returned under "timings" so the parent process
+        can record them (metrics live in the parent, not in pool workers).
+        """
+        with collect_timings() as timings:
+            try:
+                image = self.render_page(pdf_path, page_number)
+                if image is None:
+                    raise ValueError("Page could not be rendered")
+                result = self._ocr_page_result(page_number, self.ocr_page(image, time_limit))
+            except OCRTimeoutError as e:
+                result = {"page": page_number, "text": "", "error": str(e), "source": "ocr",
+                          "timed_out": True}
+            except Exception as e:
+                result = {"page": page_number, "text": "", "error": str(e), "source": "ocr"}
+        result["timings"] = timings
+        return result
+    
+    def _ocr_page_result(self, page_number, text):
+        """Per-page result for an OCRed page, with selective re-OCR or region cache stats
+        and, in adaptive DPI mode, the page's render DPI."""
+        result = {"page": page_number, "text": text, "error": None, "source": "ocr"}
+        if self.last_page_stats is not None:
+            result["ocr_stats"] = self.last_page_stats
+        if self.last_render is not None:
+            result["render"] = self.last_render
+            self.last_render = None
+        return result
+    
+    def worker_settings(self):
+        """Settings needed to rebuild an equivalent processor inside a worker process."""
+        return {
+            'dpi': self.dpi,
+            'page_window': self.page_window,
+            'grayscale': self.grayscale,
+            'omp_threads': self.omp_threads,
+            'tesseract_config': self.tesseract_config,
+            'engine': self.engine_name,
+            'ocr_mode': self.ocr_mode,
+            'confidence_threshold': self.confidence_threshold,
+            'reocr_scale': self.reocr_scale,
+            # Workers keep their own region cache; it is not shared across processes
+            'region_cache_max_bytes': self.region_cache.max_bytes if self.region_cache else 0,
+            'region_header_fraction': self.region_header_fraction,
+            'page_timeout': self.page_timeout,
+            'dpi_mode': self.dpi_mode,
+            'preview_dpi': self.preview_dpi,
+            'target_x_height': self.target_x_height,
+            'min_dpi': self.min_dpi,
+            'max_dpi': self.max_dpi,
+        }
+    
+    def cache_settings(self):
+        """Settings that change OCR output and therefore form part of the cache key."""
+        return {
+            'dpi': self.dpi,
+            'grayscale': self.grayscale,
+            'tesseract_config': self.tesseract_config,
+            'preprocessing_version': PREPROCESSING_VERSION,
+            'engine': self.engine_name,
+            'ocr_mode': self.ocr_mode,
+            'confidence_threshold': self.confidence_threshold,
+            'reocr_scale': self.reocr_scale,
+            'use_text_layer': self.use_text_layer,
+            'text_layer_min_chars': self.text_layer_min_chars,
+            'region_cache': self.region_cache is not None,
+            'region_header_fraction': self.region_header_fraction,
+            'dpi_mode': self.dpi_mode,
+            'preview_dpi': self.preview_dpi,
+            'target_x_height': self.target_x_height,
+            'min_dpi': self.min_dpi,
+            'max_dpi': self.max_dpi,
+        }
+    
+    def iter_pages(self, pdf_path, first_page=1, last_page=None, budget=None):
+        """Stream per-page OCR results, serving whole documents from the cache when possible.
+        
+        An optional DocumentBudget limits pages, pixels and time; pages it rules out are
+        not yielded and the limits hit are recorded on the budget.
+        """
+        if self.cache is None:
+            yield from self._ocr_pages(pdf_path, first_page, last_page, budget)
+            return
+        
+        key = self.cache.make_key(pdf_path, self.cache_settings())
+        cached_pages = self.cache.get(key)
+        if cached_pages is not None:
+            self.cache_stats['hits'] += 1
+            print(f"Using cached OCR result for {source_label(pdf_path)}")
+            for page in cached_pages:
+                if page["page"] >= first_page and (last_page is None or page["page"] <= last_page):
+                    if budget is not None and budget.max_pages and page["page"] >= first_page + budget.max_pages:
+                        budget.hit('page_budget')
+                        break
+                    count_page('cache')
+                    yield page
+            return
+        
+        self.cache_stats['misses'] += 1
+        pages = []
+        for page in self._ocr_pages(pdf_path, first_page, last_page, budget):
+            pages.append(page)
+            yield page
         
-        # 4. Contrast enhancement using CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
+        # Only complete, error-free documents are cached
+        is_full_document = first_page == 1 and (last_page is None or last_page == len(pages))
+        if budget is not None and budget.limits_hit:
+            is_full_document = False
+        if is_full_document and not any(page["error"] for page in pages):
+            self.cache.put(key, pages)
+    
+    def _ocr_pages(self, pdf_path, first_page=1, last_page=None, budget=None):
+        """Stream per-page results, using the embedded text layer where usable and OCR otherwise."""
+        # pdf2image and pdfinfo copy PDF bytes to a new temp file on every call (once per page
+        # window, preview and page-size lookup); write an in-memory PDF to disk once instead
+        with spooled_pdf(pdf_path) as pdf_path:
+            # Clamp to the document: pdf2image returns no image for pages past the end
+            page_count = self.count_pages(pdf_path)
+            last_page = page_count if last_page is None else min(last_page, page_count)
+            if budget is not None and budget.max_pages and last_page - first_page + 1 > budget.max_pages:
+                # Pages past the budget are never rasterized
+                budget.hit('page_budget')
+                last_page = first_page + budget.max_pages - 1
+        
+            text_layer = {}
+            if self.use_text_layer:
+                text_layer = self.extract_text_layer(pdf_path, first_page, last_page)
         
-        # 5. Binary thresholding with Otsu's method
-        _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            ocr_page_numbers = [page_number for page_number in range(first_page, last_page + 1)
+                                if page_number not in text_layer]
+            oversized = {}
+            if budget is not None and (budget.max_pixels or budget.max_page_pixels) and ocr_page_numbers:
+                ocr_page_numbers, oversized, stop_page = self.plan_pixel_budget(pdf_path, ocr_page_numbers,
+                                                                                budget)
+                if stop_page is not None:
+                    last_page = stop_page - 1
         
-        # 6. Morphological operations to clean up the image
-        kernel = np.ones((2,2), np.uint8)
-        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+            if self.workers > 1 and len(ocr_page_numbers) > 1:
+                ocr_results = self._iter_pages_parallel(pdf_path, ocr_page_numbers, budget)
+            else:
+                ocr_results = self._iter_pages_serial(pdf_path, ocr_page_numbers, budget)
         
-        return cleaned
+            try:
+                for page_number in range(first_page, last_page + 1):
+                    if budget is not None and budget.expired():
+                        # Out of time: the caller gets the pages read so far
+                        budget.hit('deadline')
+                        break
+                    if page_number in text_layer:
+                        print(f"Using embedded text layer for page {page_number}...")
+                        count_page('text_layer')
+                        yield {"page": page_number, "text": text_layer[page_number],
+                               "error": None, "source": "text_layer"}
+                    elif page_number in oversized:
+                        yield {"page": page_number, "text": "", "error": oversized[page_number],
+                               "source": "ocr"}
+                    else:
+                        result = next(ocr_results, None)
+                        if result is None and budget is not None and budget.expired():
+                            # The parallel path stops waiting for workers at the deadline
+                            budget.hit('deadline')
+                            break
+                        count_page('ocr')
+                        if result is None:
+                            # The OCR results ended before this page; never let StopIteration escape
+                            result = {"page": page_number, "text": "", "error": "Page could not be rendered",
+                                      "source": "ocr"}
+                        if "render" in result:
+                            record_render_dpi(result["render"]["dpi"])
+                        if result.get("timed_out") and budget is not None:
+                            budget.hit('page_timeout')
+                        yield result
+            finally:
+                ocr_results.close()
     
-    def process_pdf_to_text(self, pdf_path):
-        """Enhanced PDF to text conversion with better preprocessing."""
-        if not os.path.exists(pdf_path):
+    def _iter_pages_serial(self, pdf_path, page_numbers, budget=None):
+        """OCR pages one window at a time; peak memory is bounded by page_window, not page count."""
+        for page_number, image in self.iter_page_images(pdf_path, page_numbers):
+            if image is None:
+                yield {"page": page_number, "text": "", "error": "Page could not be rendered",
+                       "source": "ocr"}
+                continue
+            print(f"Processing page {page_number} with enhanced OCR...")
+            try:
+                # A page never runs past the document deadline
+                text = self.ocr_page(image, time_limit=budget.remaining() if budget else None)
+                yield self._ocr_page_result(page_number, text)
+            except OCRTimeoutError as e:
+                yield {"page": page_number, "text": "", "error": str(e), "source": "ocr",
+                       "timed_out": True}
+            except Exception as e:
+                yield {"page": page_number, "text": "", "error": str(e), "source": "ocr"}
+            finally:
+                del image
+    
+    def _iter_pages_parallel(self, pdf_path, page_numbers, budget=None):
+        """Spread rasterization and OCR over the shared worker pool, yielding pages in order.
+        
+        pdf_path is a file path (see _ocr_pages), so workers never receive the PDF bytes.
+        With a budget deadline, workers stop OCR at the deadline and the iteration ends
+        there without waiting for pages still running.
+        """
+        pool = get_worker_pool(self.workers, self.worker_settings())
+        remaining = budget.remaining() if budget else None
+        # Wall-clock deadline: monotonic clocks are not comparable across processes
+        deadline = time.time() + remaining if remaining is not None else None
+        futures = []
+        try:
+            futures = [pool.submit(_ocr_page_task, pdf_path, page_number, deadline)
+                       for page_number in page_numbers]
+            for page_number, future in zip(page_numbers, futures):
+                try:
+                    result = future.result(timeout=budget.remaining() if budget else None)
+                except FutureTimeoutError:
+                    return
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        # A worker died (e.g. killed by the OOM killer); the next document
+                        # gets a fresh pool
+                        discard_worker_pool(pool)
+                    yield {"page": page_number, "text": "", "error": str(e), "source": "ocr"}
+                    continue
+                for stage_name, seconds in result.pop("timings", {}).items():
+                    record_stage(stage_name, seconds)
+                yield result
+        finally:
+            # Also reached when the consumer stops iterating early: pages not started yet
+            # are dropped, the pool stays up for the next document
+            for future in futures:
+                future.cancel()
+    
+    def process_pdf_to_text(self, pdf_path, budget=None):
+        """Enhanced PDF to text conversion with better preprocessing.
+        
+        pdf_path may also be the PDF's bytes, e.g. an upload that was never written to disk.
+        With a DocumentBudget, "status" is 'partial' when a limit cut the document short.
+        """
+        if not isinstance(pdf_path, bytes) and not os.path.exists(pdf_path):
             return {"error": f"File '{pdf_path}' not found.", "text": ""}
         
         try:
-            # Convert PDF to images with higher DPI for better quality
-            images = convert_from_path(pdf_path, dpi=300, fmt='PNG')
-            extracted_texts = []
+            # Only the per-page text is kept; page images are dropped as soon as they are OCRed
+            page_results = list(self.iter_pages(pdf_path, budget=budget))
+            page_errors = [{"page": page["page"], "error": page["error"]}
+                           for page in page_results if page["error"]]
             
-            for i, image in enumerate(images):
-                print(f"Processing page {i+1} with enhanced OCR...")
-                
-                # Apply image enhancement
-                enhanced_image = self.enhance_image(image)
-                
-                # Perform OCR with custom configuration
-                text = pytesseract.image_to_string(enhanced_image, config=self.tesseract_config)
-                extracted_texts.append(text)
+            if page_results and len(page_errors) == len(page_results):
+                return {"error": page_errors[0]["error"], "text": "", "page_errors": page_errors,
+                        "cache": dict(self.cache_stats)}
             
-            full_text = "\n\n".join(extracted_texts)
-            return {"error": None, "text": full_text, "pages": len(images)}
+            page_sources = {'text_layer': 0, 'ocr': 0}
+            ocr_stats = {}
+            for page in page_results:
+                page_sources[page.get("source", "ocr")] += 1
+                for key, value in page.get("ocr_stats", {}).items():
+                    ocr_stats[key] = ocr_stats.get(key, 0) + value
+            
+            full_text = "\n\n".join(page["text"] for page in page_results if not page["error"])
+            page_render = [page_render_info(page) for page in page_results if page.get("render")]
+            return {"error": None, "text": full_text, "pages": len(page_results),
+                    "page_results": page_results, "page_errors": page_errors, "page_render": page_render,
+                    "page_sources": page_sources, "ocr_stats": ocr_stats,
+                    "cache": dict(self.cache_stats),
+                    "status": budget.status if budget else 'complete',
+                    "limits_hit": list(budget.limits_hit) if budget else []}
             
         except Exception as e:
             return {"error": str(e), "text": ""}
 
+# Long-lived OCR worker pools, one per (workers, worker settings), created on first use.
+# Workers start from a fresh interpreter (forkserver, or spawn where fork is unavailable)
+# rather than a fork of this multi-threaded process, and load the OCR engine only once.
+_worker_pools = {}
+_worker_pools_lock = threading.Lock()
+POOL_START_METHOD = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                     else 'spawn')
+
+def get_worker_pool(workers, settings):
+    """Return the process pool for these worker settings, starting it if needed."""
+    key = (workers, json.dumps(settings, sort_keys=True))
+    with _worker_pools_lock:
+        pool = _worker_pools.get(key)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                       initializer=_init_ocr_worker, initargs=(settings,))
+            _worker_pools[key] = pool
+        return pool
+
+def discard_worker_pool(pool):
+    """Forget a broken pool so the next document starts a new one."""
+    with _worker_pools_lock:
+        for key, value in list(_worker_pools.items()):
+            if value is pool:
+                del _worker_pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_worker_pools():
+    """Stop every OCR worker pool of this process, e.g. when a server worker exits."""
+    with _worker_pools_lock:
+        pools = list(_worker_pools.values())
+        _worker_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# Per-process OCR state for parallel page processing
+_worker_processor = None
+
+def _init_ocr_worker(settings):
+    """Process pool initializer: cap OpenMP threads and build the worker's processor."""
+    global _worker_processor
+    omp_threads = str(settings['omp_threads'])
+    # Tesseract reads OMP_THREAD_LIMIT when it starts, so children inherit the cap
+    os.environ['OMP_THREAD_LIMIT'] = omp_threads
+    os.environ['OMP_NUM_THREADS'] = omp_threads
+    cv2.setNumThreads(settings['omp_threads'])
+    
+    _worker_processor = EnhancedOCRProcessor(dpi=settings['dpi'],
+                                             page_window=settings['page_window'],
+                                             grayscale=settings['grayscale'],
+                                             omp_threads=settings['omp_threads'],
+                                             use_text_layer=False,
+                                             engine=settings['engine'],
+                                             ocr_mode=settings['ocr_mode'],
+                                             confidence_threshold=settings['confidence_threshold'],
+                                             reocr_scale=settings['reocr_scale'],
+                                             region_header_fraction=settings['region_header_fraction'],
+                                             page_timeout=settings['page_timeout'],
+                                             dpi_mode=settings['dpi_mode'],
+                                             preview_dpi=settings['preview_dpi'],
+                                             target_x_height=settings['target_x_height'],
+                                             min_dpi=settings['min_dpi'],
+                                             max_dpi=settings['max_dpi'])
+    if settings['region_cache_max_bytes'] > 0:
+        _worker_processor.region_cache = RegionOCRCache(settings['region_cache_max_bytes'])
+    _worker_processor.tesseract_config = settings['tesseract_config']
+    # Load traineddata once per worker rather than on the first page
+    _worker_processor.get_engine()
+
+def _ocr_page_task(pdf_path, page_number, deadline=None):
+    """Process pool task: rasterize and OCR one page inside a worker, stopping at the
+    document's wall-clock deadline (time.time() seconds) if there is one."""
+    time_limit = None
+    if deadline is not None:
+        time_limit = deadline - time.time()
+        if time_limit <= 0:
+            # Queued behind other pages until the document ran out of time
+            return {"page": page_number, "text": "", "error": "Request deadline reached",
+                    "source": "ocr", "timed_out": True}
+    print(f"Processing page {page_number} with enhanced OCR (worker {os.getpid()})...")
+    return _worker_processor.process_page(pdf_path, page_number, time_limit)
+
+def literal_prefix(pattern):
+    """Lower-cased literal text every match of pattern must start with ('' if none).
+    
+    Only handles the simple prefixes used in the field patterns: plain characters and
+    escaped punctuation, optionally inside a leading capturing group, up to the first
+    metacharacter or optional/repeated atom. Patterns with an alternation at top level
+    or inside the leading group, or whose leading group is optional, get ''.
+    """
+    leading_group = pattern.startswith('(') and not pattern.startswith('(?')
+    if not _prefix_is_mandatory(pattern, leading_group):
+        return ''
+    index = 1 if leading_group else 0
+    prefix = []
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\' and index + 1 < len(pattern) and not pattern[index + 1].isalnum():
+            literal, step = pattern[index + 1], 2
+        elif char.isalnum():
+            literal, step = char, 1
+        else:
+            break
+        following = pattern[index + step:index + step + 1]
+        if following in ('?', '*', '{'):
+            break
+        prefix.append(literal)
+        if following == '+':
+            break
+        index += step
+    return ''.join(prefix).lower()
+
+def _prefix_is_mandatory(pattern, leading_group):
+    """False if a match can skip the leading literals: an unescaped '|' at top level or in
+    the leading group (e.g. 'Vendor|Supplier', '(From|Vendor):'), or a leading group
+    followed by ?, * or {."""
+    depth = 0
+    in_class = False
+    in_leading = leading_group
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            index += 2
+            continue
+        if in_class:
+            if char == ']':
+                in_class = False
+        elif char == '[':
+            in_class = True
+            # A ']' straight after '[' or '[^' is a literal, not the end of the class
+            if pattern[index + 1:index + 2] == '^':
+                index += 1
+            if pattern[index + 1:index + 2] == ']':
+                index += 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0 and in_leading:
+                in_leading = False
+                if pattern[index + 1:index + 2] in ('?', '*', '{'):
+                    return False
+        elif char == '|' and (depth == 0 or (depth == 1 and in_leading)):
+            return False
+        index += 1
+    return True
+
+class FieldPatternRegistry:
+    """Compiles each field pattern list once and shares it across extractor instances.
+    
+    Every compiled pattern carries its literal prefix. For ASCII text, a pattern whose
+    prefix does not occur in the lower-cased text is skipped without running the regex,
+    and otherwise the search starts at the first occurrence of the prefix. Results are
+    identical to re.search over the whole text (tests/test_field_patterns.py).
+    """
+    
+    FLAGS = re.IGNORECASE | re.MULTILINE
+    
+    def __init__(self):
+        self._patterns = {}
+        self._document_types = {}
+    
+    def compile_patterns(self, field_patterns):
+        """Compiled (regex, literal_prefix) pairs for one field, in priority order."""
+        key = tuple(field_patterns)
+        compiled = self._patterns.get(key)
+        if compiled is None:
+            compiled = tuple((re.compile(pattern, self.FLAGS), literal_prefix(pattern))
+                             for pattern in key)
+            self._patterns[key] = compiled
+        return compiled
+    
+    def compile_document_type(self, doc_type, patterns):
+        """Compiled patterns for every field of a document type."""
+        fingerprint = tuple((field, tuple(field_patterns)) for field, field_patterns in patterns.items())
+        cached = self._document_types.get(doc_type)
+        if cached is None or cached[0] != fingerprint:
+            compiled = tuple((field, self.compile_patterns(field_patterns))
+                             for field, field_patterns in patterns.items())
+            cached = self._document_types[doc_type] = (fingerprint, compiled)
+        return cached[1]
+
+field_pattern_registry = FieldPatternRegistry()
+
 class DocumentDataExtractor:
     """Enhanced data extractor with better field detection and validation."""
     
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+    DATE_PATTERNS = [
+        re.compile(r'(\d{4}-\d{2}-\d{2})'),
+        re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})'),
+        re.compile(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})')
+    ]
+    # Field keys in output order, with the labels used in the extracted dict
+    FIELD_LABELS = {
+        'supplier': 'Supplier',
+        'document_number': 'Document Number',
+        'date': 'Date',
+        'status': 'Status',
+        'address': 'Address',
+        'to': 'To',
+    }
+    
     def __init__(self):
         # Predefined patterns for different document types
         self.patterns = {
@@ -103,12 +1128,12 @@ class DocumentDataExtractor:
                     r'Vendor\s*[:]\s*(.+?)(?:\n|$)'
                 ],
                 'document_number': [
-                    r'No\.?\s*PO\s*([A-Z0-9-]+)',
+                    r'No\.?\s*PO\s*\|?\s*([A-Z0-9-]+)',
                     r'PO\s*Number\s*[:]\s*([A-Z0-9-]+)',
                     r'Purchase\s*Order\s*[:]\s*([A-Z0-9-]+)'
                 ],
                 'date': [
-                    r'Date\s*(\d{4}-\d{2}-\d{2}\s*\d{2}:\d{2}:\d{2})',
+                    r'Date\s*\|?\s*(\d{4}-\d{2}-\d{2}\s*\d{2}:\d{2}:\d{2})',
                     r'Date\s*[:]\s*(\d{1,2}[/-]\d{1,2}[/-]\d{4})',
                     r'(\d{4}-\d{2}-\d{2})'
                 ],
@@ -121,7 +1146,7 @@ class DocumentDataExtractor:
                     r'Address\s*[:]\s*(.+?)(?:\n|$)'
                 ],
                 'to': [
-                    r'\|\s*To\s*(.+?)(?:\n|$)',
+                    r'\|\s*To\s*\|?\s*(.+?)(?:\n|$)',
                     r'To\s*[:]\s*(.+?)(?:\n|$)',
                     r'Ship\s*To\s*[:]\s*(.+?)(?:\n|$)'
                 ]
@@ -130,52 +1155,83 @@ class DocumentDataExtractor:
     
     def extract_field(self, text, field_patterns, default="Not found"):
         """Extract field using multiple pattern attempts."""
-        for pattern in field_patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        compiled = field_pattern_registry.compile_patterns(field_patterns)
+        return self._extract_compiled(text, self._lowered(text), compiled, default)
+    
+    def _lowered(self, text):
+        """Lower-cased copy for literal prefix checks, or None when text is not ASCII."""
+        # Case-insensitive regex matching and str.lower() only agree exactly on ASCII
+        return text.lower() if text.isascii() else None
+    
+    def _extract_compiled(self, text, lowered, compiled_patterns, default="Not found"):
+        """First-match-wins search over precompiled patterns."""
+        for regex, prefix in compiled_patterns:
+            position = 0
+            if prefix and lowered is not None:
+                position = lowered.find(prefix)
+                if position < 0:
+                    continue
+            match = regex.search(text, position)
             if match:
                 result = match.group(1).strip()
                 # Clean up result
-                result = re.sub(r'\s+', ' ', result)  # Replace multiple spaces
+                result = self.WHITESPACE_PATTERN.sub(' ', result)  # Replace multiple spaces
                 result = result.split('|')[0].strip()  # Take first part if pipe-separated
                 if result and result != "Not found":
                     return result
         return default
     
-    def extract_main_fields(self, full_text, doc_type='po_document'):
-        """Extract main document fields with validation."""
+    def extract_main_fields(self, full_text, doc_type='po_document', extracted_at=None, fields=None):
+        """Extract main document fields with validation.
+        
+        fields optionally limits extraction to a set of field keys (see resolve_fields).
+        """
         patterns = self.patterns.get(doc_type, self.patterns['po_document'])
+        compiled = field_pattern_registry.compile_document_type(doc_type, patterns)
+        lowered = self._lowered(full_text)
         
         extracted = {}
-        for field, field_patterns in patterns.items():
-            extracted[field] = self.extract_field(full_text, field_patterns)
+        for field, compiled_patterns in compiled:
+            if fields is None or field in fields:
+                extracted[field] = self._extract_compiled(full_text, lowered, compiled_patterns)
         
         # Post-process and validate data
-        extracted_clean = {
-            'Supplier': extracted.get('supplier', 'Not found'),
-            'Document Number': extracted.get('document_number', 'Not found'),
-            'Date': self.normalize_date(extracted.get('date', 'Not found')),
-            'Status': extracted.get('status', 'Not found'),
-            'Address': extracted.get('address', 'Not found'),
-            'To': extracted.get('to', 'Not found'),
-            'Extracted At': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        extracted_clean = {}
+        for field, label in self.FIELD_LABELS.items():
+            if fields is None or field in fields:
+                value = extracted.get(field, 'Not found')
+                extracted_clean[label] = self.normalize_date(value) if field == 'date' else value
+        extracted_clean['Extracted At'] = extracted_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         return extracted_clean
     
+    def resolve_fields(self, names):
+        """Map field keys or labels ('document_number', 'Document Number') to field keys."""
+        by_name = {}
+        for field, label in self.FIELD_LABELS.items():
+            by_name[field] = by_name[label.lower()] = field
+        
+        fields = set()
+        for name in names:
+            field = by_name.get(name.strip().lower())
+            if field is None:
+                raise ValueError(f"Unknown field '{name}' (choose from: {', '.join(self.FIELD_LABELS)})")
+            fields.add(field)
+        return fields
+    
+    def extract_main_fields_batch(self, texts, doc_type='po_document'):
+        """Extract main fields from many texts, sharing compiled patterns and one timestamp."""
+        extracted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return [self.extract_main_fields(text, doc_type, extracted_at) for text in texts]
+    
     def normalize_date(self, date_str):
         """Normalize date to standard format."""
         if date_str == "Not found" or not date_str:
             return "Not found"
         
         # Try to parse different date formats
-        date_patterns = [
-            r'(\d{4}-\d{2}-\d{2})',
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
-            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, date_str)
+        for pattern in self.DATE_PATTERNS:
+            match = pattern.search(date_str)
             if match:
                 if len(match.groups()) == 1:
                     return match.group(1)
@@ -188,87 +1244,142 @@ class DocumentDataExtractor:
         
         return date_str  # Return as-is if no pattern matches
 
+class ItemTableStateMachine:
+    """Push-based single-pass item table parser.
+    
+    Lines are fed one at a time; each call returns the item rows finalized by that line
+    (an item is complete once the next item starts). Every line is matched against one
+    precompiled item-start pattern exactly once.
+    
+    Inside the item section every non-empty line belongs to the current item, until the
+    totals block (a line starting with Subtotal, Total or Grand Total, see
+    ItemTableParser.SECTION_END_PATTERN) ends the section. The totals therefore never
+    merge into the last item.
+    """
+    
+    def __init__(self, parser):
+        self.parser = parser
+        self.current_item = None
+        self.finished = False
+    
+    def feed(self, line):
+        """Consume one line of text; returns the list of item rows it completed."""
+        if self.finished:
+            return []
+        line = line.strip()
+        # A single character is a stray mark (a checkbox glyph in the text layer, a speck
+        # in OCR), never item data
+        if len(line) < 2:
+            return []
+        
+        rows = []
+        if self.parser.item_start_pattern.match(line):
+            # A new item starts (the first one also opens the item section)
+            if self.current_item:
+                rows = self.parser.build_rows([self.current_item])
+            self.current_item = [line]
+        elif self.current_item:
+            if self.parser.SECTION_END_PATTERN.match(line):
+                # The totals block closes the last item and the items section
+                rows = self.close()
+            else:
+                self.current_item.append(line)
+        return rows
+    
+    def feed_text(self, text):
+        """Consume a block of text (e.g. one page); returns the item rows it completed."""
+        rows = []
+        for line in text.split('\n'):
+            rows.extend(self.feed(line))
+        return rows
+    
+    def close(self):
+        """Finish parsing and return the last pending item row, if any."""
+        rows = self.parser.build_rows([self.current_item]) if self.current_item else []
+        self.current_item = None
+        self.finished = True
+        return rows
+
 class ItemTableParser:
     """Enhanced item table parser with better structure detection."""
     
+    # Start of the totals block, possibly behind OCR'd table borders ('| Subtotal 1.395.000',
+    # 'GrandTotal'); anchored so the 'Total Cost' column header does not count
+    SECTION_END_PATTERN = re.compile(r'(?i)[|\s]*(?:sub\s*total|grand\s*total|total\b)')
+    PRICE_PATTERN = re.compile(r'\d+[\.,]\d+')
+    PRICE_PATTERNS = [
+        re.compile(r'(\d+\.\d+,\d+)'),  # 750.000,00
+        re.compile(r'(\d+,\d+)'),       # 1,00
+        re.compile(r'(\d+\.\d+)')       # 750.000
+    ]
+    LAST_LINE_NUMBER_PATTERN = re.compile(r'(\d+[\.,]\d+[\.,]\d+|\d+[\.,]\d+)')
+    DESCRIPTION_PRICE_PATTERN = re.compile(r'\d+[\.,]\d+[\.,]\d+|\d+[\.,]\d+')
+    # Table borders in OCR text and column gaps in normalized text layers
+    COLUMN_SEPARATOR_PATTERN = re.compile(r'\s*\|\s*')
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+    FIELD_NOISE_PATTERN = re.compile(r'[^\w\s\-\.]')
+    SYSTEM_ROW_KEYWORDS = ['subtotal', 'disc', 'amount tax', 'total']
+    DESCRIPTION_FIELDS = ['Item Name', 'Type', 'Part Number', 'Product Code', 'Size', 'Color', 'Brand']
+    
     def __init__(self):
         self.item_start_patterns = [
             r'^PRT\d*',
             r'^\d+\s+[A-Z]',
             r'^[A-Z]{2,}\d+'
         ]
+        # One alternation, equivalent to re.match with any of the patterns, in a single call
+        self.item_start_pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in self.item_start_patterns))
+    
+    def create_state_machine(self):
+        """Incremental parser for callers that receive text page by page."""
+        return ItemTableStateMachine(self)
     
     def parse_item_table(self, full_text):
         """Parse item table with enhanced structure detection."""
-        lines = full_text.split('\n')
-        items_raw = []
-        current_item = []
-        in_item_section = False
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Detect start of item section
-            if not in_item_section and any(re.match(pattern, line) for pattern in self.item_start_patterns):
-                in_item_section = True
-            
-            if in_item_section:
-                # Check if this is a new item
-                if any(re.match(pattern, line) for pattern in self.item_start_patterns):
-                    if current_item:
-                        items_raw.append(current_item)
-                    current_item = [line]
-                elif current_item:
-                    # Add line to current item if it contains relevant data
-                    if self.is_item_data_line(line):
-                        current_item.append(line)
-                    elif re.search(r'(?i)(subtotal|total|grand\s*total)', line):
-                        # End of items section
-                        break
+        machine = self.create_state_machine()
+        items = machine.feed_text(full_text)
+        items.extend(machine.close())
+        return items
+    
+    def parse_item_table_columns(self, full_text, as_dataframe=False):
+        """Parse the item table into columns ({field: [values]}) or a pandas DataFrame.
         
-        if current_item:
-            items_raw.append(current_item)
+        Intended for bulk consumers; the templates keep using the list-of-dicts output.
+        """
+        items = self.parse_item_table(full_text)
+        columns = {}
+        for item in items:
+            for field, value in item.items():
+                columns.setdefault(field, []).append(value)
         
-        return self.process_raw_items(items_raw)
+        if as_dataframe:
+            import pandas as pd  # Only bulk consumers need pandas; keep it off the startup path
+            return pd.DataFrame(columns)
+        return columns
     
-    def is_item_data_line(self, line):
-        """Check if line contains item data."""
-        indicators = [
-            '/',  # Description separator
-            re.search(r'\d+[\.,]\d+', line),  # Price patterns
-            '|' in line,  # Column separator
-            len(line) > 10  # Minimum length for meaningful data
-        ]
-        return any(indicators)
-    
-    def process_raw_items(self, items_raw):
-        """Process raw item data into structured format."""
-        table_items = []
-        
+    def build_rows(self, items_raw):
+        """Parse, filter and enhance raw items into final rows."""
+        rows = []
         for item_lines in items_raw:
             if not item_lines:
                 continue
-                
+            
             item_data = self.parse_single_item(item_lines)
-            if item_data:
-                table_items.append(item_data)
-        
-        # Filter out system rows
-        filtered_items = []
-        for item in table_items:
-            desc = item.get('Description', '').lower()
-            if not any(keyword in desc for keyword in ['subtotal', 'disc', 'amount tax', 'total']):
-                filtered_items.append(item)
-        
-        # Split descriptions and add metadata
-        enhanced_items = []
-        for item in filtered_items:
-            enhanced_item = self.enhance_item_data(item)
-            enhanced_items.append(enhanced_item)
-        
-        return enhanced_items
+            if not item_data:
+                continue
+            
+            # Filter out system rows
+            desc = item_data.get('Description', '').lower()
+            if any(keyword in desc for keyword in self.SYSTEM_ROW_KEYWORDS):
+                continue
+            
+            # Split descriptions and add metadata
+            rows.append(self.enhance_item_data(item_data))
+        return rows
+    
+    def process_raw_items(self, items_raw):
+        """Process raw item data into structured format."""
+        return self.build_rows(items_raw)
     
     def parse_single_item(self, item_lines):
         """Parse a single item from multiple lines."""
@@ -282,10 +1393,11 @@ class ItemTableParser:
         base_description = parts[1] if len(parts) > 1 else ''
         
         # Combine all description lines
-        full_description = base_description
+        description_parts = [base_description]
         for line in item_lines[1:]:
-            if '/' in line or not re.search(r'\d+[\.,]\d+', line):
-                full_description += ' ' + line.strip()
+            if '/' in line or not self.PRICE_PATTERN.search(line):
+                description_parts.append(line.strip())
+        full_description = ' '.join(description_parts)
         
         # Extract numeric values
         numeric_values = self.extract_numeric_values(item_lines)
@@ -307,34 +1419,39 @@ class ItemTableParser:
         """Extract numeric values from item lines."""
         all_text = ' '.join(item_lines)
         
-        # Find all price-like patterns
-        price_patterns = [
-            r'(\d+\.\d+,\d+)',  # 750.000,00
-            r'(\d+,\d+)',       # 1,00
-            r'(\d+\.\d+)'       # 750.000
-        ]
-        
-        numbers = []
-        for pattern in price_patterns:
-            numbers.extend(re.findall(pattern, all_text))
+        # Unit cost is the last of all price-like matches, taken pattern by pattern
+        # (750.000,00 then 1,00 then 750.000), once there are at least three of them.
+        # Later patterns are scanned first so the earlier ones are only counted if needed.
+        unit_cost = ''
+        match_count = 0
+        for pattern in reversed(self.PRICE_PATTERNS):
+            matches = pattern.findall(all_text)
+            if matches and not unit_cost and match_count == 0:
+                unit_cost = matches[-1]
+            match_count += len(matches)
+            if match_count >= 3:
+                break
+        if match_count < 3:
+            unit_cost = ''
         
         # Last line usually contains final prices
         last_line = item_lines[-1] if item_lines else ""
-        last_numbers = re.findall(r'(\d+[\.,]\d+[\.,]\d+|\d+[\.,]\d+)', last_line)
+        last_numbers = self.LAST_LINE_NUMBER_PATTERN.findall(last_line)
         
         return {
             'total_cost': last_numbers[0] if len(last_numbers) > 0 else '',
             'discount': last_numbers[1] if len(last_numbers) > 1 else '',
             'quantity': last_numbers[2] if len(last_numbers) > 2 else '',
-            'unit_cost': numbers[-1] if numbers and len(numbers) >= 3 else ''
+            'unit_cost': unit_cost
         }
     
     def clean_description(self, description):
         """Clean and normalize description text."""
-        # Remove price patterns
-        cleaned = re.sub(r'\d+[\.,]\d+[\.,]\d+|\d+[\.,]\d+', '', description)
+        # Remove price patterns and column separators
+        cleaned = self.DESCRIPTION_PRICE_PATTERN.sub('', description)
+        cleaned = self.COLUMN_SEPARATOR_PATTERN.sub(' ', cleaned)
         # Remove excessive whitespace
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = self.WHITESPACE_PATTERN.sub(' ', cleaned)
         return cleaned.strip()
     
     def enhance_item_data(self, item):
@@ -344,17 +1461,10 @@ class ItemTableParser:
         
         # Standardize field extraction
         enhanced = item.copy()
-        enhanced.update({
-            'Item Name': self.clean_field(desc_parts[0] if len(desc_parts) > 0 else ''),
-            'Type': self.clean_field(desc_parts[1] if len(desc_parts) > 1 else ''),
-            'Part Number': self.clean_field(desc_parts[2] if len(desc_parts) > 2 else ''),
-            'Product Code': self.clean_field(desc_parts[3] if len(desc_parts) > 3 else ''),
-            'Size': self.clean_field(desc_parts[4] if len(desc_parts) > 4 else ''),
-            'Color': self.clean_field(desc_parts[5] if len(desc_parts) > 5 else ''),
-            'Brand': self.clean_field(desc_parts[6] if len(desc_parts) > 6 else ''),
-            'Description Parts Count': len(desc_parts),
-            'Has Structured Description': len(desc_parts) > 3
-        })
+        for index, field in enumerate(self.DESCRIPTION_FIELDS):
+            enhanced[field] = self.clean_field(desc_parts[index]) if index < len(desc_parts) else ''
+        enhanced['Description Parts Count'] = len(desc_parts)
+        enhanced['Has Structured Description'] = len(desc_parts) > 3
         
         return enhanced
     
@@ -364,10 +1474,54 @@ class ItemTableParser:
             return ''
         
         # Remove extra whitespace and special characters
-        cleaned = re.sub(r'[^\w\s\-\.]', '', field)
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = self.FIELD_NOISE_PATTERN.sub('', field)
+        cleaned = self.WHITESPACE_PATTERN.sub(' ', cleaned)
         return cleaned.strip()
 
+def create_ocr_processor():
+    """Build an OCR processor configured from the Flask app settings."""
+    return EnhancedOCRProcessor(workers=app.config['OCR_WORKERS'], cache=ocr_cache,
+                                engine=app.config['OCR_ENGINE'], ocr_mode=app.config['OCR_MODE'],
+                                region_cache=region_cache, page_timeout=app.config['OCR_PAGE_TIMEOUT'],
+                                dpi_mode=app.config['OCR_DPI_MODE'],
+                                use_text_layer=app.config['OCR_TEXT_LAYER'])
+
+def create_document_budget():
+    """Page, pixel and time limits for one document from the Flask app settings.
+    
+    The deadline starts now, so create the budget once the document has been admitted.
+    """
+    return DocumentBudget(max_pages=app.config['OCR_MAX_PAGES'],
+                          max_pixels=app.config['OCR_MAX_PIXELS'],
+                          max_page_pixels=app.config['OCR_MAX_PAGE_PIXELS'],
+                          deadline=app.config['OCR_REQUEST_DEADLINE'])
+
+def warmup_ocr_stack():
+    """Load everything the first request would otherwise pay for; returns seconds per step.
+    
+    Meant to run once in a server's parent process before it forks workers, so children
+    start with imported modules, compiled patterns and a loaded OCR engine. No page is
+    recognized here: running Tesseract's OpenMP threads before fork() can hang children.
+    """
+    timings = {}
+    
+    started = time.perf_counter()
+    processor = create_ocr_processor()
+    # First OpenCV calls initialize its dispatch tables; run the preprocessing once on a blank page
+    processor.enhance_image(np.full((3508, 2480), 255, np.uint8))
+    timings['preprocess'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    # Loads traineddata for tesserocr; imports pytesseract for the subprocess engine
+    processor.get_engine()
+    timings['engine'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    DocumentDataExtractor().extract_main_fields('')
+    ItemTableParser().parse_item_table('')
+    timings['patterns'] = time.perf_counter() - started
+    return timings
+
 def process_pdf_to_text(pdf_path):
     """Enhanced wrapper function for backward compatibility."""
     processor = EnhancedOCRProcessor()
@@ -385,77 +1539,420 @@ def parse_item_table(full_text):
     items = parser.parse_item_table(full_text)
     return items
 
+# Outputs the pipeline can compute; callers may request any subset
+PIPELINE_OUTPUTS = ('main_fields', 'items')
+OPTIONAL_OUTPUTS = ('text',)
+
+def process_document(source, outputs=PIPELINE_OUTPUTS, fields=None, first_page=1, last_page=None,
+                     processor=None, budget=None):
+    """Compute only the requested outputs for a PDF path or PDF bytes, OCRing pages lazily.
+    
+    outputs is any subset of 'main_fields', 'items' and 'text' (the result also carries
+    page_texts, the full text of each successful page); fields limits main_fields
+    to some field keys or labels; first_page/last_page restrict the pages read. When
+    only main fields are requested, pages stop being rasterized and OCRed as soon as
+    every requested field has been found, and the item parser never runs unless 'items'
+    is requested. A field is then taken from the first pages containing it.
+    
+    With a DocumentBudget the result's "status" is 'partial' (and "limits_hit" says why)
+    when pages were left out to stay within its page, pixel or time limits.
+    
+    Errors caused by the request itself (unknown outputs or fields, a page range outside
+    the document) carry "error_kind": 'invalid'; anything else is a processing failure.
+    """
+    unknown = set(outputs) - set(PIPELINE_OUTPUTS) - set(OPTIONAL_OUTPUTS)
+    if unknown or not outputs:
+        return {"error": f"Unknown outputs {sorted(unknown)} (choose from: "
+                         f"{', '.join(PIPELINE_OUTPUTS + OPTIONAL_OUTPUTS)})",
+                "error_kind": 'invalid'}
+    if not isinstance(source, bytes) and not os.path.exists(source):
+        return {"error": f"File '{source}' not found."}
+    
+    processor = processor or EnhancedOCRProcessor()
+    extractor = DocumentDataExtractor()
+    try:
+        field_keys = extractor.resolve_fields(fields) if fields else None
+    except ValueError as e:
+        return {"error": str(e), "error_kind": 'invalid'}
+    want_fields = 'main_fields' in outputs
+    stop_early = want_fields and not ({'items', 'text'} & set(outputs))
+    
+    page_texts = []
+    page_count = 0
+    page_errors = []
+    page_sources = {'text_layer': 0, 'ocr': 0}
+    page_render = []
+    main_data = None
+    stopped_early = False
+    extracted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    try:
+        # Poppler reads files: an in-memory upload is written to disk once for the document
+        with spooled_pdf(source) as pdf_path:
+            # A range that starts past the end (e.g. 'pages=5-' on a 3-page PDF) is invalid,
+            # not an empty success
+            if first_page > 1 or last_page is not None:
+                document_pages = processor.count_pages(pdf_path)
+                if first_page > document_pages:
+                    return {"error": f"Page range {first_page}-{last_page or ''} is outside the "
+                                     f"document ({document_pages} pages).",
+                            "error_kind": 'invalid'}
+                last_page = document_pages if last_page is None else min(last_page, document_pages)
+        
+            pages = processor.iter_pages(pdf_path, first_page, last_page, budget)
+            try:
+                for page in pages:
+                    page_count += 1
+                    page_sources[page.get("source", "ocr")] += 1
+                    if page.get("render"):
+                        page_render.append(page_render_info(page))
+                    if page["error"]:
+                        page_errors.append({"page": page["page"], "error": page["error"]})
+                        continue
+                    page_texts.append({"page": page["page"], "source": page.get("source", "ocr"),
+                                       "text": page["text"]})
+                
+                    if stop_early:
+                        text_so_far = "\n\n".join(page["text"] for page in page_texts)
+                        with stage('extract_main_fields'):
+                            main_data = extractor.extract_main_fields(text_so_far, extracted_at=extracted_at,
+                                                                      fields=field_keys)
+                        if all(value != 'Not found' for value in main_data.values()):
+                            stopped_early = True
+                            break
+            finally:
+                # Closing the generator stops rasterization and cancels pending worker pages
+                pages.close()
+    except Exception as e:
+        return {"error": str(e)}
+    
+    if page_count and len(page_errors) == page_count:
+        return {"error": page_errors[0]["error"], "page_errors": page_errors}
+    
+    full_text = "\n\n".join(page["text"] for page in page_texts)
+    result = {"error": None, "pages": page_count, "page_errors": page_errors, "page_texts": page_texts,
+              "page_sources": page_sources, "page_render": page_render, "cache": dict(processor.cache_stats),
+              "outputs": sorted(outputs), "stopped_early": stopped_early,
+              "status": budget.status if budget else 'complete',
+              "limits_hit": list(budget.limits_hit) if budget else []}
+    if want_fields:
+        if main_data is None:
+            with stage('extract_main_fields'):
+                main_data = extractor.extract_main_fields(full_text, extracted_at=extracted_at,
+                                                          fields=field_keys)
+        result["main_fields"] = main_data
+    if 'items' in outputs:
+        with stage('parse_item_table'):
+            result["items"] = ItemTableParser().parse_item_table(full_text)
+    if 'text' in outputs:
+        result["text"] = full_text
+    return result
+
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
         file = request.files.get('file')
         if file and file.filename:
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
             
-            try:
-                # Create enhanced processor instances
-                ocr_processor = EnhancedOCRProcessor()
-                data_extractor = DocumentDataExtractor()
-                table_parser = ItemTableParser()
-                
-                # Process the file with enhanced OCR
-                ocr_result = ocr_processor.process_pdf_to_text(filepath)
-                
-                if ocr_result["error"]:
+            with ExitStack() as stack:
+                try:
+                    stack.enter_context(admission.admit('upload'))
+                except AdmissionRejected as e:
                     return render_template('result.html', 
                                          main={}, 
                                          table=[], 
-                                         error=f"OCR Error: {ocr_result['error']}")
+                                         error=f"Server busy, please try again shortly: {e}"), 429
                 
-                full_text = ocr_result["text"]
+                # Processed from memory (or a temp spool file); nothing is left in uploads/
+                source = stack.enter_context(upload_store.open(file, filename))
+                tracker = stack.enter_context(track_request('upload'))
+                try:
+                    # Create enhanced processor instances
+                    ocr_processor = create_ocr_processor()
+                    data_extractor = DocumentDataExtractor()
+                    table_parser = ItemTableParser()
                 
-                if not full_text.strip():
-                    return render_template('result.html', 
-                                         main={}, 
-                                         table=[], 
-                                         error="No text could be extracted from the PDF.")
+                    # Process the file with enhanced OCR, within the page, pixel and time budget
+                    budget = create_document_budget()
+                    ocr_result = ocr_processor.process_pdf_to_text(source, budget=budget)
+                
+                    if ocr_result["error"]:
+                        tracker.set_status('error')
+                        return render_template('result.html', 
+                                             main={}, 
+                                             table=[], 
+                                             error=f"OCR Error: {ocr_result['error']}")
                 
-                # Extract structured data
-                main_data = data_extractor.extract_main_fields(full_text)
-                table_data = table_parser.parse_item_table(full_text)
+                    full_text = ocr_result["text"]
                 
-                # Add processing metadata
-                processing_info = {
-                    'filename': filename,
-                    'pages_processed': ocr_result.get("pages", 0),
-                    'items_found': len(table_data),
-                    'processing_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
+                    if not full_text.strip():
+                        return render_template('result.html', 
+                                             main={}, 
+                                             table=[], 
+                                             error="No text could be extracted from the PDF.")
                 
-                # Save processed data to JSON for later analysis
-                processed_data = {
-                    'main_fields': main_data,
-                    'items': table_data,
-                    'processing_info': processing_info,
-                    'raw_text': full_text[:1000] + "..." if len(full_text) > 1000 else full_text
-                }
+                    # Extract structured data
+                    with stage('extract_main_fields'):
+                        main_data = data_extractor.extract_main_fields(full_text)
+                    with stage('parse_item_table'):
+                        table_data = table_parser.parse_item_table(full_text)
                 
-                processed_filename = f"processed_{filename.replace('.pdf', '.json')}"
-                processed_path = os.path.join(app.config['PROCESSED_FOLDER'], processed_filename)
+                    # Add processing metadata
+                    processing_info = {
+                        'filename': filename,
+                        'pages_processed': ocr_result.get("pages", 0),
+                        'items_found': len(table_data),
+                        'page_sources': ocr_result.get("page_sources", {}),
+                        'page_render': ocr_result.get("page_render", []),
+                        'cache': ocr_result.get("cache", {}),
+                        'region_cache': region_cache.stats() if region_cache else {},
+                        'processing_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        **budget.summary(),
+                        **tracker.summary()
+                    }
                 
-                with open(processed_path, 'w', encoding='utf-8') as f:
-                    json.dump(processed_data, f, indent=2, ensure_ascii=False)
+                    # Keep complete results, with the full text of every page, for later lookups
+                    if budget.limits_hit:
+                        tracker.set_status('partial')
+                    else:
+                        page_texts = [page for page in ocr_result["page_results"] if not page["error"]]
+                        processing_info['document_id'] = result_store.save(
+                            filename, main_data, table_data, page_texts, processing_info)
                 
-                return render_template('result.html', 
-                                     main=main_data, 
-                                     table=table_data,
-                                     processing_info=processing_info)
+                    return render_template('result.html', 
+                                         main=main_data, 
+                                         table=table_data,
+                                         processing_info=processing_info)
                                      
-            except Exception as e:
-                return render_template('result.html', 
-                                     main={}, 
-                                     table=[], 
-                                     error=f"Processing Error: {str(e)}")
+                except Exception as e:
+                    tracker.set_status('error')
+                    return render_template('result.html', 
+                                         main={}, 
+                                         table=[], 
+                                         error=f"Processing Error: {str(e)}")
     
     return render_template('upload.html')
 
+def iter_document_events(source, filename, fields=None, first_page=1, last_page=None,
+                         processor=None, budget=None):
+    """Yield pipeline events for a document as the work completes.
+    
+    Events (dicts with an "event" key), in order of availability:
+      page         one per page as soon as it is OCRed (or read from the text layer/cache)
+      main_fields  fields newly found or changed by the latest page, until all are found
+      items        item rows as the parser finalizes them
+      summary      the complete main fields (authoritative), counts, status and processing info
+      error        a fatal error; no summary follows
+    
+    The summary's status is 'partial' when the budget (by default the app's page, pixel
+    and time limits) cut the document short; limits_hit names the limits.
+    """
+    processor = processor or create_ocr_processor()
+    budget = budget or create_document_budget()
+    extractor = DocumentDataExtractor()
+    machine = ItemTableParser().create_state_machine()
+    
+    with track_request('stream') as tracker:
+        if not isinstance(source, bytes) and not os.path.exists(source):
+            tracker.set_status('error')
+            yield {"event": "error", "error": f"File '{source}' not found."}
+            return
+        
+        field_keys = extractor.resolve_fields(fields) if fields else None
+        extracted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        page_texts, page_errors, items = [], [], []
+        page_sources = {'text_layer': 0, 'ocr': 0}
+        page_render = []
+        resolved = {}
+        fields_complete = False
+        
+        pages = processor.iter_pages(source, first_page, last_page, budget)
+        try:
+            for page in pages:
+                page_sources[page.get("source", "ocr")] += 1
+                event = {"event": "page", "page": page["page"], "source": page.get("source", "ocr"),
+                         "text": page["text"], "error": page["error"]}
+                if page.get("render"):
+                    event["render"] = page["render"]
+                    page_render.append(page_render_info(page))
+                yield event
+                if page["error"]:
+                    page_errors.append({"page": page["page"], "error": page["error"]})
+                    continue
+                page_texts.append({"page": page["page"], "source": page.get("source", "ocr"),
+                                   "text": page["text"]})
+                
+                if not fields_complete:
+                    text_so_far = "\n\n".join(text["text"] for text in page_texts)
+                    with stage('extract_main_fields'):
+                        main_data = extractor.extract_main_fields(text_so_far, extracted_at=extracted_at,
+                                                                  fields=field_keys)
+                    del main_data['Extracted At']
+                    changed = {label: value for label, value in main_data.items()
+                               if value != 'Not found' and resolved.get(label) != value}
+                    if changed:
+                        resolved.update(changed)
+                        yield {"event": "main_fields", "fields": changed}
+                    fields_complete = len(resolved) == len(main_data)
+                
+                # Blank lines are skipped by the parser, so page-by-page feeding matches
+                # parse_item_table on the joined text
+                with stage('parse_item_table'):
+                    rows = machine.feed_text(page["text"])
+                if rows:
+                    items.extend(rows)
+                    yield {"event": "items", "items": rows}
+        except GeneratorExit:
+            # The client went away; closing the page iterator stops the remaining OCR
+            tracker.set_status('cancelled')
+            raise
+        except Exception as e:
+            tracker.set_status('error')
+            yield {"event": "error", "error": str(e)}
+            return
+        finally:
+            pages.close()
+        
+        rows = machine.close()
+        if rows:
+            items.extend(rows)
+            yield {"event": "items", "items": rows}
+        
+        page_count = len(page_texts) + len(page_errors)
+        if not page_count and not budget.limits_hit:
+            tracker.set_status('invalid')
+            yield {"event": "error", "error": f"Page range {first_page}-{last_page or ''} is outside "
+                                              f"the document."}
+            return
+        if page_count and not page_texts:
+            tracker.set_status('error')
+            yield {"event": "error", "error": page_errors[0]["error"], "page_errors": page_errors}
+            return
+        
+        full_text = "\n\n".join(page["text"] for page in page_texts)
+        with stage('extract_main_fields'):
+            main_data = extractor.extract_main_fields(full_text, extracted_at=extracted_at,
+                                                      fields=field_keys)
+        processing_info = {
+            'filename': filename,
+            'pages_processed': page_count,
+            'items_found': len(items),
+            'page_sources': page_sources,
+            'page_render': page_render,
+            'page_errors': page_errors,
+            'cache': dict(processor.cache_stats),
+            'region_cache': region_cache.stats() if region_cache else {},
+            'processing_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            **budget.summary(),
+            **tracker.summary()
+        }
+        if budget.limits_hit:
+            tracker.set_status('partial')
+        summary = {"event": "summary", "status": budget.status, "limits_hit": list(budget.limits_hit),
+                   "main_fields": main_data, "items_count": len(items),
+                   "pages_processed": page_count, "processing_info": processing_info}
+        if not fields and first_page == 1 and last_page is None and not budget.limits_hit:
+            summary["document_id"] = result_store.save(filename, main_data, items, page_texts,
+                                                       processing_info)
+        yield summary
+
+def run_document_pipeline(source, filename, endpoint='api', outputs=PIPELINE_OUTPUTS, fields=None,
+                          first_page=1, last_page=None):
+    """Run the requested pipeline stages on a file path or PDF bytes; returns the API payload.
+    
+    The payload's status is 'complete', or 'partial' when the app's page, pixel or time
+    limits cut the document short (limits_hit names them).
+    """
+    with track_request(endpoint) as tracker:
+        budget = create_document_budget()
+        result = process_document(source, outputs, fields, first_page, last_page,
+                                  processor=create_ocr_processor(), budget=budget)
+        
+        if result["error"]:
+            if result.get("error_kind") == 'invalid':
+                tracker.set_status('invalid')
+                return {'error': result["error"], 'error_kind': 'invalid'}
+            tracker.set_status('error')
+            return {'error': result["error"]}
+        
+        payload = {'status': result["status"], 'limits_hit': result["limits_hit"]}
+        payload.update({key: result[key] for key in ('main_fields', 'items', 'text') if key in result})
+        payload['pages_processed'] = result["pages"]
+        if 'items' in result:
+            payload['items_count'] = len(result["items"])
+        payload['processing_info'] = {
+            'filename': filename,
+            'pages_processed': result["pages"],
+            'items_found': len(result.get("items", [])),
+            'outputs': result["outputs"],
+            'stopped_early': result["stopped_early"],
+            'page_sources': result["page_sources"],
+            'page_render': result["page_render"],
+            'cache': result["cache"],
+            'region_cache': region_cache.stats() if region_cache else {},
+            'processing_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            **budget.summary(),
+            **tracker.summary()
+        }
+        if budget.limits_hit:
+            tracker.set_status('partial')
+        
+        # Complete results go to the result store; partial lookups are not recorded
+        is_complete = (set(PIPELINE_OUTPUTS) <= set(outputs) and not fields
+                       and first_page == 1 and last_page is None and not budget.limits_hit)
+        if is_complete:
+            payload['document_id'] = result_store.save(filename, result["main_fields"], result["items"],
+                                                       result["page_texts"], payload['processing_info'])
+        return payload
+
+def parse_pipeline_options(values):
+    """Read outputs=main_fields,items, fields=document_number,date and pages=1-3 request values."""
+    options = {}
+    if values.get('outputs'):
+        options['outputs'] = tuple(name.strip() for name in values['outputs'].split(',') if name.strip())
+        unknown = set(options['outputs']) - set(PIPELINE_OUTPUTS) - set(OPTIONAL_OUTPUTS)
+        if unknown:
+            raise ValueError(f"Unknown outputs {sorted(unknown)} (choose from: "
+                             f"{', '.join(PIPELINE_OUTPUTS + OPTIONAL_OUTPUTS)})")
+    if values.get('fields'):
+        options['fields'] = [name for name in values['fields'].split(',') if name.strip()]
+        DocumentDataExtractor().resolve_fields(options['fields'])
+    if values.get('pages'):
+        first, separator, last = values['pages'].partition('-')
+        try:
+            options['first_page'] = int(first) if first.strip() else 1
+            if not separator:
+                options['last_page'] = options['first_page']
+            else:
+                options['last_page'] = int(last) if last.strip() else None
+        except ValueError:
+            raise ValueError(f"Invalid page range '{values['pages']}' (use e.g. 1, 2-5 or 3-)")
+        if options['first_page'] < 1 or (options['last_page'] is not None
+                                         and options['last_page'] < options['first_page']):
+            raise ValueError(f"Invalid page range '{values['pages']}'")
+    return options
+
+def run_job(filepath, filename):
+    """Job queue handler: process a saved upload, then remove it (or retain it if enabled)."""
+    try:
+        # Jobs wait for an OCR slot as long as it takes; JOB_WORKERS already bounds them
+        with admission.admit('job', block=True):
+            return run_document_pipeline(filepath, filename, endpoint='job')
+    finally:
+        upload_store.discard(filepath, filename)
+
+job_queue = JobQueue(run_job,
+                     db_path=app.config['JOB_DB_PATH'],
+                     workers=app.config['JOB_WORKERS'],
+                     max_queue=app.config['JOB_MAX_QUEUE'])
+
+def busy_response(error):
+    """429 response for a document turned away by admission control."""
+    response = jsonify({'error': str(error), 'reason': error.reason})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
 @app.route('/api/process', methods=['POST'])
 def api_process():
     """API endpoint for programmatic access."""
@@ -465,52 +1962,168 @@ def api_process():
     
     try:
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        try:
+            options = parse_pipeline_options(request.values)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            with admission.admit('api'), upload_store.open(file, filename) as source:
+                result = run_document_pipeline(source, filename, **options)
+        except AdmissionRejected as e:
+            return busy_response(e)
         
-        # Process with enhanced classes
-        ocr_processor = EnhancedOCRProcessor()
-        data_extractor = DocumentDataExtractor()
-        table_parser = ItemTableParser()
+        if result.get('error'):
+            # Bad page ranges, outputs or fields are the client's error, not the server's
+            status = 400 if result.get('error_kind') == 'invalid' else 500
+            return jsonify({'error': result['error']}), status
         
-        ocr_result = ocr_processor.process_pdf_to_text(filepath)
+        return jsonify(result)
         
-        if ocr_result["error"]:
-            return jsonify({'error': ocr_result["error"]}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/process/stream', methods=['POST'])
+def api_process_stream():
+    """Streaming variant of /api/process: newline-delimited JSON events as pages complete."""
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    filename = secure_filename(file.filename)
+    try:
+        options = parse_pipeline_options(request.values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    options.pop('outputs', None)
+    
+    # Take an OCR slot and stage the upload before streaming starts: request files are
+    # closed once the view returns. Both are released when the response is closed.
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(admission.admit('stream'))
+        except AdmissionRejected as e:
+            return busy_response(e)
+        source = stack.enter_context(upload_store.open(file, filename))
+        uploads = stack.pop_all()
+    
+    def generate():
+        for event in iter_document_events(source, filename, **options):
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(uploads.close)
+    # Ask reverse proxies not to buffer, so each event reaches the client immediately
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Queue a document for background processing and return its job id."""
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    try:
+        filename = secure_filename(file.filename)
+        # Prefix with a unique id so concurrent uploads of the same filename don't collide
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+        file.save(filepath)
         
-        main_data = data_extractor.extract_main_fields(ocr_result["text"])
-        table_data = table_parser.parse_item_table(ocr_result["text"])
+        try:
+            job_id = job_queue.submit(filepath, filename)
+        except QueueFullError as e:
+            os.remove(filepath)
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 429
         
         return jsonify({
-            'main_fields': main_data,
-            'items': table_data,
-            'pages_processed': ocr_result.get("pages", 0),
-            'items_count': len(table_data)
-        })
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f"/api/jobs/{job_id}"
+        }), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Return status, queued/running timings and, once done, the result of a job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: stage latencies, request counts, queue depth and cache stats."""
+    if ocr_cache is not None:
+        cache_stats = ocr_cache.stats()
+        for field in ('hits', 'misses', 'bytes'):
+            CACHE_GAUGE.set(cache_stats[field], field=field)
+    if region_cache is not None:
+        for field, value in region_cache.stats().items():
+            REGION_CACHE_GAUGE.set(value, field=field)
+    job_stats = job_queue.stats()
+    JOB_QUEUE_GAUGE.set(job_stats['queue_depth'], field='queue_depth')
+    for status, count in job_stats['jobs'].items():
+        JOB_QUEUE_GAUGE.set(count, field=status)
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+def stream_stored_result(document_id, download_name=None):
+    """Stream a stored result: gzip bytes as-is when requested or accepted, else decompressed."""
+    data = result_store.get_payload(document_id)
+    if data is None:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    if request.args.get('gzip') == '1':
+        response = Response(iter_chunks(data), mimetype='application/gzip')
+        if download_name:
+            download_name += '.gz'
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(iter_chunks(data), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    else:
+        response = Response(iter_decompressed(data), mimetype='application/json')
+    
+    if download_name:
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
+
+@app.route('/api/documents')
+def api_list_documents():
+    """Query stored documents by document_number, supplier, date_from/date_to or filename."""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    documents = result_store.query(document_number=request.args.get('document_number'),
+                                   supplier=request.args.get('supplier'),
+                                   date_from=request.args.get('date_from') or request.args.get('date'),
+                                   date_to=request.args.get('date_to') or request.args.get('date'),
+                                   filename=request.args.get('filename'),
+                                   limit=limit, offset=offset)
+    return jsonify({'documents': documents, 'count': len(documents), 'limit': limit, 'offset': offset})
+
+@app.route('/api/documents/<document_id>')
+def api_get_document(document_id):
+    """Stored main fields, items and full per-page text of one document."""
+    return stream_stored_result(document_id)
+
 @app.route('/download/<filename>')
 def download_processed_data(filename):
-    """Download processed data as JSON."""
+    """Download the latest processed result for an uploaded filename as JSON (?gzip=1 for .json.gz)."""
     try:
-        processed_filename = f"processed_{filename.replace('.pdf', '.json')}"
-        processed_path = os.path.join(app.config['PROCESSED_FOLDER'], processed_filename)
-        
-        if os.path.exists(processed_path):
-            with open(processed_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            response = app.response_class(
-                response=json.dumps(data, indent=2, ensure_ascii=False),
-                status=200,
-                mimetype='application/json'
-            )
-            response.headers['Content-Disposition'] = f'attachment; filename="{processed_filename}"'
-            return response
-        else:
+        document_id = result_store.latest_id(secure_filename(filename))
+        if document_id is None:
             return jsonify({'error': 'File not found'}), 404
+        
+        processed_filename = f"processed_{filename.replace('.pdf', '.json')}"
+        return stream_stored_result(document_id, processed_filename)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -524,4 +2137,8 @@ if __name__ == '__main__':
     print("  - Clean web interface")
     print("  - JSON data export")
     print(f"\n🌐 Access the app at: http://127.0.0.1:5001/")
+    # Start job workers and requeue jobs interrupted by the previous run now rather than on
+    # the first submission; with the debug reloader only the serving child runs them
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_queue.start()
     app.run(debug=True, port=5001)
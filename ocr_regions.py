@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Average-hash grid (rows x columns) used to bucket candidate regions; layout regions
+# are wide and short, so the grid is too
+HASH_GRID = (8, 32)
+
+
+def segment_regions(binary, min_gap=None, ink_threshold=2):
+    """Split a binarized page (dark text on white) into horizontal layout regions.
+
+    A region is a run of rows containing ink; runs separated by fewer than min_gap
+    blank rows are merged, so lines of one block stay together while blocks separated
+    by whitespace (logo, supplier box, address, tables) become separate regions.
+    Returns a list of (top, bottom) row ranges.
+    """
+    height = binary.shape[0]
+    if min_gap is None:
+        # Roughly half a text line at 300 DPI, scaled with the page height
+        min_gap = max(8, int(height * 0.006))
+
+    ink_rows = np.count_nonzero(binary < 128, axis=1) > ink_threshold
+    rows = np.flatnonzero(ink_rows)
+    if rows.size == 0:
+        return []
+
+    # Start a new region wherever the gap to the previous ink row is at least min_gap
+    breaks = np.flatnonzero(np.diff(rows) >= min_gap)
+    starts = np.concatenate(([rows[0]], rows[breaks + 1]))
+    ends = np.concatenate((rows[breaks], [rows[-1]]))
+
+    pad = min_gap // 2
+    return [(max(0, int(top) - pad), min(height, int(bottom) + 1 + pad))
+            for top, bottom in zip(starts, ends)]
+
+
+def average_hash(region):
+    """Perceptual hash of a region: HASH_GRID cell means thresholded at the overall mean."""
+    rows, columns = HASH_GRID
+    small = cv2.resize(region, (columns, rows), interpolation=cv2.INTER_AREA)
+    return np.packbits(small < small.mean()).tobytes()
+
+
+class RegionOCRCache:
+    """Bounded in-memory cache of OCR text for recurring page regions (letterheads etc.).
+
+    Regions are bucketed by shape and perceptual hash, and a candidate is only reused
+    after a pixel-level comparison: at most max_diff_ratio of its pixels may differ.
+    The strict check keeps regions that differ in a few characters (PO number, date)
+    from ever sharing text. Least recently used entries are evicted past max_bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_diff_ratio=0.0001):
+        self.max_bytes = max_bytes
+        self.max_diff_ratio = max_diff_ratio
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry id -> (bucket, packed ink bits, text, size)
+        self._buckets = {}             # (shape, hash) -> [entry ids]
+        self._next_id = 0
+        self._total_bytes = 0
+
+    @staticmethod
+    def _pack(region):
+        return np.packbits(region < 128)
+
+    def lookup(self, region):
+        """Return (text, token) where text is the cached OCR text or None on a miss.
+
+        Pass the token back to store() after OCRing a miss so the region is not hashed twice.
+        """
+        bucket = (region.shape, average_hash(region))
+        packed = self._pack(region)
+        max_diff = int(region.size * self.max_diff_ratio)
+
+        with self._lock:
+            for entry_id in self._buckets.get(bucket, ()):
+                _, cached_bits, text, _ = self._entries[entry_id]
+                diff = int(np.unpackbits(np.bitwise_xor(cached_bits, packed)).sum())
+                if diff <= max_diff:
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return text, None
+            self.misses += 1
+        return None, (bucket, packed)
+
+    def store(self, token, text):
+        """Remember the OCR text for a region that missed in lookup()."""
+        bucket, packed = token
+        size = packed.nbytes + len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket, packed, text, size)
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes:
+                old_id, (old_bucket, _, _, old_size) = self._entries.popitem(last=False)
+                self._buckets[old_bucket].remove(old_id)
+                if not self._buckets[old_bucket]:
+                    del self._buckets[old_bucket]
+                self._total_bytes -= old_size
+
+    def stats(self):
+        """Hit/miss counters, hit rate and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
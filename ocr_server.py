@@ -0,0 +1,189 @@
+"""Production server for the OCR web application.
+
+Usage:
+    python ocr_server.py --bind 0.0.0.0:5001 --workers 4
+    OCR_SERVER_WORKERS=4 python ocr_server.py
+
+The application is imported and the OCR stack warmed up once in the parent process,
+which then forks a fixed set of long-lived workers: gunicorn sync workers when gunicorn
+is installed, otherwise werkzeug servers sharing the parent's listening socket. Each
+worker keeps its metrics, caches and OCR process pool for its whole life and runs its
+own background job threads. Import and warmup times are printed at startup and exported
+as ocr_startup_seconds on /metrics.
+"""
+import os
+import time
+import signal
+import argparse
+import threading
+import traceback
+
+# Keep Tesseract single-threaded per process before anything loads it; OpenMP thread
+# pools do not survive fork() and workers already provide the parallelism
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+def load_application(warmup=True):
+    """Import ocr_modul and warm the OCR stack, returning (module, {phase: seconds})."""
+    started = time.perf_counter()
+    import ocr_modul
+    timings = {'import': time.perf_counter() - started}
+
+    if warmup:
+        started = time.perf_counter()
+        steps = ocr_modul.warmup_ocr_stack()
+        timings['warmup'] = time.perf_counter() - started
+        print("🔥 Warmup: " + ", ".join(f"{step} {seconds * 1000:.0f} ms"
+                                       for step, seconds in steps.items()))
+
+    from ocr_metrics import STARTUP_SECONDS
+    for phase, seconds in timings.items():
+        STARTUP_SECONDS.set(round(seconds, 4), phase=phase)
+    print("⏱️  Startup: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms"
+                                     for phase, seconds in timings.items()))
+    # Requeue jobs interrupted by the previous run now, while no worker is running any
+    ocr_modul.job_queue.recover()
+    return ocr_modul, timings
+
+
+def serve_gunicorn(module, host, port, workers, timeout):
+    """Serve with preforked gunicorn workers; the already-warm app is inherited on fork."""
+    from gunicorn.app.base import BaseApplication
+
+    class OCRApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    def post_fork(server, worker):
+        # Threads do not survive fork(): every worker runs its own job threads, all
+        # claiming from the shared job database
+        module.job_queue.start(recover=False)
+
+    OCRApplication(module.app, {
+        'bind': f"{host}:{port}",
+        'workers': workers,
+        'preload_app': True,
+        'timeout': timeout,
+        'post_fork': post_fork,
+    }).run()
+
+
+def run_werkzeug_worker(module, server):
+    """Body of one serve_werkzeug worker: serve requests one at a time until SIGTERM."""
+    # Ctrl+C reaches the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def stop(signum, frame):
+        # serve_forever() can only be stopped from another thread; a request in progress
+        # is answered first
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    module.job_queue.start(recover=False)
+    try:
+        server.serve_forever()
+    finally:
+        module.shutdown_worker_pools()
+
+
+def serve_werkzeug(module, host, port, workers):
+    """Fallback without gunicorn: preforked, long-lived werkzeug workers.
+
+    The parent binds the socket and forks workers children of the warm app, which all
+    accept on it; the parent itself stays single-threaded (keeping fork() safe), restarts
+    workers that die and stops them on SIGINT/SIGTERM.
+    """
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, module.app, threaded=False)
+    # Workers wait on the same socket; the ones that lose the race for a connection must
+    # get an error from accept() instead of blocking in it
+    server.socket.setblocking(False)
+    children = set()
+
+    def spawn_worker():
+        pid = os.fork()
+        if pid:
+            children.add(pid)
+            return
+        status = 0
+        try:
+            run_werkzeug_worker(module, server)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            # Never return into the parent's supervisor loop
+            os._exit(status)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn_worker()
+    try:
+        while True:
+            pid, status = os.wait()
+            children.discard(pid)
+            print(f"⚠️  Worker {pid} exited with status {status}; starting a new one")
+            time.sleep(1)
+            spawn_worker()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the OCR web application in production mode.")
+    parser.add_argument('--bind', default=os.environ.get('OCR_SERVER_BIND', '0.0.0.0:5001'),
+                        help="host:port to listen on")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('OCR_SERVER_WORKERS', 2)),
+                        help="Worker processes, each serving one request at a time")
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('OCR_SERVER_TIMEOUT', 300)),
+                        help="gunicorn worker timeout in seconds; long documents need a generous value")
+    parser.add_argument('--no-warmup', action='store_true', help="Skip pre-warming the OCR stack")
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'werkzeug'], default='auto')
+    args = parser.parse_args(argv)
+
+    host, _, port = args.bind.rpartition(':')
+    module, _ = load_application(warmup=not args.no_warmup)
+
+    server = args.server
+    if server == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'werkzeug'
+
+    print(f"🚀 Serving on {host}:{port} with {server} ({args.workers} workers)")
+    if server == 'gunicorn':
+        serve_gunicorn(module, host, int(port), args.workers, args.timeout)
+    else:
+        serve_werkzeug(module, host, int(port), args.workers)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+import gzip
+import json
+import time
+import uuid
+import sqlite3
+import zlib
+
+# Summary columns returned by list/query calls (the payload itself is only read on download)
+SUMMARY_COLUMNS = ['id', 'filename', 'document_number', 'supplier', 'date', 'pages',
+                   'items_count', 'created_at']
+
+
+class ResultStore:
+    """SQLite store of processed documents with indexed main fields.
+
+    Each document keeps its main fields, items, processing info and full per-page text
+    as one gzip-compressed JSON payload, so downloads stream the stored bytes without
+    re-serializing. document_number, supplier and date are indexed columns for lookups.
+    """
+
+    def __init__(self, db_path='results.db', compress_level=6):
+        self.db_path = db_path
+        self.compress_level = compress_level
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    document_number TEXT,
+                    supplier TEXT COLLATE NOCASE,
+                    date TEXT,
+                    pages INTEGER,
+                    items_count INTEGER,
+                    created_at REAL,
+                    payload BLOB
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_number ON documents(document_number)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_supplier ON documents(supplier)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_date ON documents(date)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_filename "
+                         "ON documents(filename, created_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def save(self, filename, main_fields, items, page_texts, processing_info=None):
+        """Store one processed document and return its id.
+
+        page_texts is a list of {"page", "source", "text"} dicts with the full page text.
+        """
+        document_id = uuid.uuid4().hex
+        payload = {
+            'document_id': document_id,
+            'main_fields': main_fields,
+            'items': items,
+            'processing_info': processing_info or {},
+            'pages': [{'page': page['page'], 'source': page.get('source', 'ocr'), 'text': page['text']}
+                      for page in page_texts],
+        }
+        data = gzip.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                             compresslevel=self.compress_level)
+
+        def indexed(label):
+            value = main_fields.get(label)
+            return None if value in (None, '', 'Not found') else value
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO documents (id, filename, document_number, supplier, date, pages, "
+                "items_count, created_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (document_id, filename, indexed('Document Number'), indexed('Supplier'),
+                 indexed('Date'), len(page_texts), len(items), time.time(), data)
+            )
+        return document_id
+
+    def query(self, document_number=None, supplier=None, date_from=None, date_to=None,
+              filename=None, limit=50, offset=0):
+        """Summaries of matching documents, newest first. Dates compare as YYYY-MM-DD strings."""
+        clauses, params = [], []
+        if document_number:
+            clauses.append("document_number = ?")
+            params.append(document_number)
+        if supplier:
+            clauses.append("supplier = ?")
+            params.append(supplier)
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        if filename:
+            clauses.append("filename = ?")
+            params.append(filename)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM documents {where} "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [int(limit), int(offset)]
+            ).fetchall()
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def latest_id(self, filename):
+        """Id of the most recently stored document with this filename, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM documents WHERE filename = ? "
+                               "ORDER BY created_at DESC LIMIT 1", (filename,)).fetchone()
+        return row[0] if row else None
+
+    def get_payload(self, document_id):
+        """The stored gzip-compressed JSON payload, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM documents WHERE id = ?", (document_id,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, document_id):
+        """The decoded document payload, or None if unknown."""
+        data = self.get_payload(document_id)
+        return json.loads(gzip.decompress(data)) if data is not None else None
+
+
+def iter_decompressed(data, chunk_size=64 * 1024):
+    """Stream a gzip payload as plain JSON bytes, one chunk at a time."""
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    for start in range(0, len(data), chunk_size):
+        chunk = decompressor.decompress(data[start:start + chunk_size])
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def iter_chunks(data, chunk_size=64 * 1024):
+    """Stream stored bytes as they are."""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
@@ -0,0 +1,103 @@
+import os
+import uuid
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class UploadStore:
+    """Stages uploaded PDFs for processing without leaving files behind.
+
+    Uploads up to spool_threshold bytes are handed over as PDF bytes (the processor
+    hashes them in memory and writes one temp copy per document for poppler); larger
+    ones are spooled to a private temporary file that is removed as soon as processing
+    ends. Keeping the originals is an
+    opt-in retention policy: retained copies get a unique name in retention_dir and
+    the oldest are evicted once the directory exceeds retention_max_bytes.
+    """
+
+    def __init__(self, spool_threshold=8 * 1024 * 1024, spool_dir=None, retain=False,
+                 retention_dir='uploads/retained', retention_max_bytes=1024 * 1024 * 1024):
+        self.spool_threshold = spool_threshold
+        self.spool_dir = spool_dir
+        self.retain = retain
+        self.retention_dir = retention_dir
+        self.retention_max_bytes = retention_max_bytes
+        self._lock = threading.Lock()
+
+        if retain and not os.path.exists(retention_dir):
+            os.makedirs(retention_dir)
+
+    @contextmanager
+    def open(self, file, filename):
+        """Yield the upload as PDF bytes or, above the spool threshold, a temporary path."""
+        stream = file.stream if hasattr(file, 'stream') else file
+        head = stream.read(self.spool_threshold + 1)
+
+        if len(head) <= self.spool_threshold:
+            try:
+                yield head
+            finally:
+                self.keep(head, filename)
+            return
+
+        fd, spool_path = tempfile.mkstemp(dir=self.spool_dir, suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(head)
+                del head
+                shutil.copyfileobj(stream, f, 1024 * 1024)
+            yield spool_path
+        finally:
+            self.discard(spool_path, filename)
+
+    def discard(self, path, filename):
+        """Remove a file that has been processed, retaining it first when enabled."""
+        try:
+            if self.retain:
+                self._store(filename, lambda target: shutil.move(path, target))
+            else:
+                os.remove(path)
+        except OSError as e:
+            print(f"⚠️  Could not clean up upload {path}: {e}")
+
+    def keep(self, data, filename):
+        """Retain an in-memory upload when the retention policy is enabled."""
+        if not self.retain:
+            return
+        def write(target):
+            with open(target, 'wb') as f:
+                f.write(data)
+        try:
+            self._store(filename, write)
+        except OSError as e:
+            print(f"⚠️  Could not retain upload {filename}: {e}")
+
+    def _store(self, filename, write):
+        # Unique prefix so uploads sharing a filename never overwrite each other
+        target = os.path.join(self.retention_dir, f"{uuid.uuid4().hex}_{filename}")
+        write(target)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """Delete the oldest retained uploads until the directory fits the size cap."""
+        entries = []
+        for name in os.listdir(self.retention_dir):
+            path = os.path.join(self.retention_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.retention_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,99 @@
+"""Admission control limits shared by several processes through lock files."""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from ocr_governor import AdmissionController, AdmissionRejected
+
+# Spawned children import this module afresh instead of inheriting pytest's threads
+CONTEXT = multiprocessing.get_context('spawn')
+
+
+def hold_slot(lock_dir, max_in_flight, hold, results):
+    """Child process: take a slot, hold it, report (start, end) or the rejection reason."""
+    controller = AdmissionController(max_in_flight=max_in_flight, max_waiting=8, max_wait=20,
+                                     lock_dir=lock_dir)
+    try:
+        with controller.admit('test'):
+            started = time.monotonic()
+            time.sleep(hold)
+            results.put(('admitted', started, time.monotonic()))
+    except AdmissionRejected as e:
+        results.put(('rejected', e.reason))
+
+
+def try_admit(lock_dir, results):
+    """Child process: ask for a slot with no room to wait."""
+    controller = AdmissionController(max_in_flight=1, max_waiting=0, max_wait=1, lock_dir=lock_dir)
+    try:
+        with controller.admit('test'):
+            results.put(('admitted',))
+    except AdmissionRejected as e:
+        results.put(('rejected', e.reason))
+
+
+def die_holding_slot(lock_dir, ready):
+    """Child process: take the only slot and exit without releasing it."""
+    controller = AdmissionController(max_in_flight=1, max_waiting=0, lock_dir=lock_dir)
+    controller._acquire('test', block=False)
+    ready.set()
+    time.sleep(0.2)
+    os._exit(1)
+
+
+def run(target, *args):
+    process = CONTEXT.Process(target=target, args=args)
+    process.start()
+    return process
+
+
+def test_in_flight_limit_holds_across_processes(tmp_path):
+    results = CONTEXT.Queue()
+    processes = [run(hold_slot, str(tmp_path), 2, 0.5, results) for _ in range(5)]
+    outcomes = [results.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join(10)
+
+    assert all(outcome[0] == 'admitted' for outcome in outcomes)
+    # At no moment did more than two processes hold a slot
+    for _, started, _ in outcomes:
+        overlapping = sum(1 for _, other_start, other_end in outcomes
+                          if other_start <= started < other_end)
+        assert overlapping <= 2
+
+
+def test_full_queue_is_rejected_in_another_process(tmp_path):
+    controller = AdmissionController(max_in_flight=1, max_waiting=0, lock_dir=str(tmp_path))
+    results = CONTEXT.Queue()
+    with controller.admit('test'):
+        process = run(try_admit, str(tmp_path), results)
+        assert results.get(timeout=30) == ('rejected', 'queue_full')
+        process.join(10)
+
+    # Released: the next process gets the slot
+    process = run(try_admit, str(tmp_path), results)
+    assert results.get(timeout=30) == ('admitted',)
+    process.join(10)
+
+
+def test_slot_of_a_dead_process_is_released(tmp_path):
+    ready = CONTEXT.Event()
+    process = run(die_holding_slot, str(tmp_path), ready)
+    assert ready.wait(30)
+    controller = AdmissionController(max_in_flight=1, max_waiting=1, max_wait=10, lock_dir=str(tmp_path))
+    started = time.monotonic()
+    with controller.admit('test'):
+        assert time.monotonic() - started < 5
+    process.join(10)
+
+
+def test_without_lock_dir_limits_are_per_process():
+    controller = AdmissionController(max_in_flight=1, max_waiting=0)
+    with controller.admit('test'):
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit('test'):
+                pass
+    assert rejected.value.reason == 'queue_full'
+    assert controller.stats()['shared'] is False
@@ -0,0 +1,75 @@
+"""Literal-prefix skipping in field extraction must agree with a plain re.search."""
+import re
+
+import pytest
+
+from ocr_modul import DocumentDataExtractor, FieldPatternRegistry, literal_prefix
+
+SAMPLE_TEXTS = [
+    "Vendor: ACME\n",
+    "From: Bayan Motor\nVendor: ACME\n",
+    "Supplier | NEW MASSA MOTOR | No. PO PO0625-TDKI-00002\n"
+    "Date 2025-05-31 00:00:00 | Status PO | Approved\n"
+    "Jl. Kawasan Industri Pulo Gadung\n| To TJM AUTOSERVICE JAKARTA\n",
+    "supplier: lower case label\nPO Number: PO-1\nShip To: Gudang\n",
+    "Purchase Order: X-9\nAddress: Somewhere 12\nStatus: Open\n",
+    "Total 1.395.000 | Subtotal | Disc\n",
+    "",
+]
+
+# Alternations and optional leading groups; group 1 always takes part in a match
+EXTRA_PATTERNS = [
+    [r'(From|Vendor)\s*:\s*(.+)'],
+    [r'(Vendor|Supplier)\s*:\s*(.+?)(?:\n|$)'],
+    [r'(?:Vendor)?:\s*(.+)'],
+    [r'((?:Vendor)*)\s*:\s*(.+)'],
+    [r'[|]\s*To\s*(.+?)(?:\n|$)'],
+]
+
+
+def reference_extract(text, field_patterns, default="Not found"):
+    """extract_field written as a plain re.search over the whole text."""
+    for pattern in field_patterns:
+        match = re.search(pattern, text, FieldPatternRegistry.FLAGS)
+        if match:
+            result = re.sub(r'\s+', ' ', match.group(1).strip()).split('|')[0].strip()
+            if result and result != "Not found":
+                return result
+    return default
+
+
+def all_pattern_lists():
+    extractor = DocumentDataExtractor()
+    for patterns in extractor.patterns.values():
+        for field_patterns in patterns.values():
+            yield field_patterns
+            for pattern in field_patterns:
+                yield [pattern]
+    yield from EXTRA_PATTERNS
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    (r'(From|Vendor)\s*:\s*(.+)', ''),
+    (r'Vendor|Supplier', ''),
+    (r'(Vendor)?:\s*(.+)', ''),
+    (r'Supplier\s*\|\s*(.+?)(?:\||$)', 'supplier'),
+    (r'(Jl\..+?)(?:\n|$)', 'jl.'),
+    (r'\|\s*To\s*(.+?)(?:\n|$)', '|'),
+    (r'No\.?\s*PO\s*([A-Z0-9-]+)', 'no'),
+    (r'[|]\s*To', ''),
+])
+def test_literal_prefix(pattern, expected):
+    assert literal_prefix(pattern) == expected
+
+
+@pytest.mark.parametrize('text', SAMPLE_TEXTS)
+def test_extract_field_matches_re_search(text):
+    extractor = DocumentDataExtractor()
+    for field_patterns in all_pattern_lists():
+        assert extractor.extract_field(text, field_patterns) == reference_extract(text, field_patterns), field_patterns
+
+
+def test_alternation_in_leading_group_is_not_skipped():
+    extractor = DocumentDataExtractor()
+    assert extractor.extract_field("Vendor: ACME\n", [r'(From|Vendor)\s*:\s*(.+)']) == 'Vendor'
+    assert extractor.extract_field("Vendor: ACME\n", [r'(?:From|Vendor)\s*:\s*(.+)']) == 'ACME'
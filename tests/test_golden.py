@@ -0,0 +1,42 @@
+"""The committed golden outputs agree with the references they were taken from."""
+import json
+import os
+
+import pytest
+
+from ocr_benchmark import DEFAULT_DOCUMENTS, compare_with_golden, golden_path
+from ocr_modul import ItemTableParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, 'benchmarks', 'golden')
+
+
+def load_golden(pdf_name):
+    with open(golden_path(GOLDEN_DIR, pdf_name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_default_documents_are_all_bundled_pdfs():
+    bundled = sorted(name for name in os.listdir(ROOT) if name.endswith('.pdf'))
+    assert sorted(DEFAULT_DOCUMENTS) == bundled
+
+
+def test_po_00022_golden_has_the_reference_items():
+    with open(os.path.join(ROOT, 'enhanced_processed_PO0625-TDKI-00022.json'), encoding='utf-8') as f:
+        reference = json.load(f)
+    golden = load_golden('PO0625-TDKI-00022.pdf')
+    assert [item['Item Code'] for item in golden['items']] == \
+        [item['Kode Item'] for item in reference['items']]
+
+    lines = []
+    for item in reference['items']:
+        lines.extend(item['Data Mentah'].split(' | '))
+    result = {'main_fields': golden['main_fields'],
+              'items': ItemTableParser().parse_item_table('\n'.join(lines))}
+    assert compare_with_golden(result, golden) == (1.0, 1.0)
+
+
+@pytest.mark.parametrize('pdf_name', ['PO0625-TDKI-00002.pdf', 'PO0625-TDKI-00022.pdf'])
+def test_golden_items_exclude_totals(pdf_name):
+    for item in load_golden(pdf_name)['items']:
+        assert 'Subtotal' not in item['Raw Lines']
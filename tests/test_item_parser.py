@@ -0,0 +1,72 @@
+"""Item table parsing on OCR text of the bundled purchase orders."""
+from ocr_modul import ItemTableParser
+
+# OCR text of the item table in PO0625-TDKI-00002.pdf (ocr_exercise.ipynb)
+PO_00002_TABLE = """\
+Addr Jl. Bintara Jaya No.36, RT.006/RW.009. Bintara Jaya,
+ess Kec. Bekasi Bar., Kota Bks, Jawa Barat 17136
+Item Code Description Unit Cost Disc Quantity Total Cost
+PRT0625- WHEEL CYLINDER RR RH/NO TYPE/No
+00001/1476011260/IS Size/No Color/ISUZU 750.000,00
+750.000,00 | 0,00 1,00 .
+PRT0425- PRIMING PUMP DENSO/NO TYPE/No
+00026/0921300050/DENS Size/No Color/DENSO 220.000,00
+Oo 220.000,00 | 0.00 1,00
+PRT1220-00212- INSULATOR ENGINE MOUNTING FR RH/NO
+960/D12361BZ171001/DH TYPE/No Size/No Color/DAIHATSU 275.000,00
+275.000,00 | 0.00 1,00
+PRT1220-00133/11- BULB ASPIRA 24V/21W 1 FILAMENT/NO
+24S2521BA15S/ASPR TYPE/No Size/No Color/ASPIRA 10.000,00
+§.000,00 0,00 2,00
+
+Subtotal 1.255.000
+
+Discount 0
+
+Subtotal After
+
+Disc 1.255.000
+
+Amount Tax 0
+
+Grand Total 1.255.000
+"""
+
+# Last item and totals of PO0625-TDKI-00022.pdf, with the table borders OCR'd as '|'
+PO_00022_TAIL = """\
+PRT0221- AIRCLEANERME017246/NOTYPE/No
+00118/ME017246/MT Size/NoColor/MITSUBISHI 145.000,00
+145.000,00|0,00 1,00
+| Subtotal 1.395.000
+| Discount 0
+Subtotal After 4.395.000
+| AmountTax 0
+| GrandTotal 1.395.000
+TotalCost 0
+"""
+
+
+def test_last_item_is_kept_and_totals_end_the_section():
+    items = ItemTableParser().parse_item_table(PO_00002_TABLE)
+    assert [item['Item Code'] for item in items] == ['PRT0625', 'PRT0425', 'PRT1220-00212',
+                                                     'PRT1220-00133/11']
+    assert 'Subtotal' not in items[-1]['Raw Lines']
+    assert items[-1]['Brand'] == 'ASPIRA'
+
+
+def test_totals_behind_table_borders_end_the_section():
+    items = ItemTableParser().parse_item_table(PO_00022_TAIL)
+    assert len(items) == 1
+    assert items[0]['Item Code'] == 'PRT0221'
+    assert items[0]['Total Cost'] == '145.000,00'
+    assert items[0]['Raw Lines'].endswith('145.000,00|0,00 1,00')
+
+
+def test_state_machine_matches_whole_text_parse():
+    parser = ItemTableParser()
+    machine = parser.create_state_machine()
+    rows = []
+    for page in PO_00002_TABLE.split('\n\n'):
+        rows.extend(machine.feed_text(page))
+    rows.extend(machine.close())
+    assert rows == parser.parse_item_table(PO_00002_TABLE)
@@ -0,0 +1,48 @@
+"""Page range validation in process_document, with a processor that never runs poppler."""
+import pytest
+
+from ocr_modul import EnhancedOCRProcessor, process_document
+
+
+class FakeProcessor(EnhancedOCRProcessor):
+    """Three pages of text; records the range process_document asks for."""
+
+    def __init__(self, pages=3):
+        super().__init__()
+        self.pages = pages
+        self.requested = None
+
+    def count_pages(self, pdf_path):
+        return self.pages
+
+    def iter_pages(self, pdf_path, first_page, last_page, budget=None):
+        self.requested = (first_page, last_page)
+        for number in range(first_page, (last_page or self.pages) + 1):
+            yield {"page": number, "error": None, "source": "text_layer",
+                   "text": f"Supplier | ACME | page {number}"}
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(b'%PDF-1.4 fake')
+    return str(path)
+
+
+@pytest.mark.parametrize('first_page, last_page', [(5, None), (4, 9), (4, 4)])
+def test_range_past_the_end_is_invalid(pdf_path, first_page, last_page):
+    result = process_document(pdf_path, outputs=['text'], first_page=first_page,
+                              last_page=last_page, processor=FakeProcessor())
+    assert result["error_kind"] == 'invalid'
+    assert '3 pages' in result["error"]
+
+
+@pytest.mark.parametrize('first_page, last_page, expected', [
+    (2, None, (2, 3)), (1, 9, (1, 3)), (1, None, (1, None)),
+])
+def test_range_is_clamped_to_the_document(pdf_path, first_page, last_page, expected):
+    processor = FakeProcessor()
+    result = process_document(pdf_path, outputs=['text'], first_page=first_page,
+                              last_page=last_page, processor=processor)
+    assert result.get("error") is None
+    assert processor.requested == expected
@@ -0,0 +1,73 @@
+"""The werkzeug fallback serves from long-lived preforked workers."""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stand-in for ocr_modul: a WSGI app that counts requests per process
+SERVER_SCRIPT = textwrap.dedent("""
+    import json, os, sys, types
+    import ocr_server
+
+    marker_dir, port = sys.argv[1], int(sys.argv[2])
+    served = {'count': 0}
+
+    def app(environ, start_response):
+        served['count'] += 1
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps({'pid': os.getpid(), 'count': served['count']}).encode()]
+
+    def mark(name):
+        open(os.path.join(marker_dir, f'{name}-{os.getpid()}'), 'w').close()
+
+    module = types.SimpleNamespace(
+        app=app,
+        job_queue=types.SimpleNamespace(start=lambda recover=True: mark('jobs')),
+        shutdown_worker_pools=lambda: mark('pools'),
+    )
+    ocr_server.serve_werkzeug(module, '127.0.0.1', port, 2)
+""")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(port):
+    for _ in range(100):
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5) as response:
+                return json.load(response)
+        except OSError:
+            time.sleep(0.1)
+    raise AssertionError("server did not answer")
+
+
+def test_werkzeug_workers_are_long_lived(tmp_path):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, '-c', SERVER_SCRIPT, str(tmp_path), str(port)], cwd=ROOT)
+    try:
+        responses = [get(port) for _ in range(12)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+    pids = {response['pid'] for response in responses}
+    assert len(pids) <= 2
+    # Per-process state (metrics, caches) survives between requests
+    assert max(response['count'] for response in responses) >= 6
+    # Every worker ran job threads and shut its OCR pools down on exit
+    markers = set(os.listdir(tmp_path))
+    for pid in pids:
+        assert f'jobs-{pid}' in markers
+        assert f'pools-{pid}' in markers
+    assert server.returncode == 0
@@ -0,0 +1,72 @@
+"""Text layer output (pdftotext -layout) goes through the same extractors as OCR text."""
+from ocr_modul import DocumentDataExtractor, ItemTableParser, normalize_layout_text
+
+# Page 1 of PO0625-TDKI-00002.pdf in pdftotext -layout style (from the glyphs of its
+# text layer): columns separated by runs of spaces, no table borders
+PO_00002_LAYOUT = """\
+   PT TIDUNG JAYA MANDIRI INDONESIA
+
+   PT TIDUNG JAYA MANDIRI INDONESIA
+   Status PO                                                                         Approved
+   Jl. Kawasan Industri Pulo Gadung
+   021-30320490
+   ApprovedBy                                                                          hermin
+
+   Supplier          NEW MASSA MOTOR                  No. PO       PO0625-TDKI-00002
+   Jl. Raya Bekasi, RT. 1/RW.5, Rawa                  Date         2025-05-31 00:00:00
+   Address           Terate, Kota Jakarta Timur, Daerah
+   Khusus Ibukota Jakarta, Indonesia                  PO Title     PERSEDIAAN STOCK SPAREPART JAKARTA
+   No. Rek           006.001.424.863                  To
+                                                      TJM AUTOSERVICE JAKARTA
+   Item Code              Description                          Unit Cost    Disc    Quantity   Total Cost
+   PRT0625-               WHEEL CYLINDER RR RH/NO TYPE/No
+   00001/1476011260/IS    Size/No Color/ISUZU                                             750.000,00
+                                                       750.000,00   0,00      1,00
+   PRT0425-               PRIMING PUMP DENSO/NO TYPE/No
+   00026/0921300050/DENS  Size/No Color/DENSO                                             220.000,00
+                                                       220.000,00   0,00      1,00
+   O
+   PRT1220-00212-         INSULATOR ENGINE MOUNTING FR RH/NO
+   960/D12361BZ171001/DH  TYPE/No Size/No Color/DAIHATSU                                  275.000,00
+                                                       275.000,00   0,00      1,00
+   PRT1220-00133/11-      BULB ASPIRA 24V/21W 1 FILAMENT/NO
+   24S2521BA15S/ASPR      TYPE/No Size/No Color/ASPIRA                                     10.000,00
+                                                         5.000,00   0,00      2,00
+   Subtotal                                                                        1.255.000
+   Discount                                                                                0
+   Grand Total                                                                     1.255.000
+"""
+
+
+def test_column_gaps_become_separators():
+    assert normalize_layout_text("   Supplier          NEW MASSA MOTOR      No. PO   X-1  \n") == \
+        "Supplier | NEW MASSA MOTOR | No. PO | X-1\n"
+    assert normalize_layout_text("PRIMING PUMP DENSO/NO TYPE/No") == "PRIMING PUMP DENSO/NO TYPE/No"
+
+
+def test_main_fields_from_layout_text():
+    fields = DocumentDataExtractor().extract_main_fields(normalize_layout_text(PO_00002_LAYOUT))
+    fields.pop('Extracted At')
+    assert fields == {
+        'Supplier': 'NEW MASSA MOTOR',
+        'Document Number': 'PO0625-TDKI-00002',
+        'Date': '2025-05-31',
+        'Status': 'Approved',
+        'Address': 'Jl. Kawasan Industri Pulo Gadung',
+        'To': 'TJM AUTOSERVICE JAKARTA',
+    }
+
+
+def test_items_from_layout_text():
+    items = ItemTableParser().parse_item_table(normalize_layout_text(PO_00002_LAYOUT))
+    # As for OCR text, 'Total Cost' is the first number on an item's last line
+    assert [(item['Item Code'], item['Quantity'], item['Total Cost']) for item in items] == [
+        ('PRT0625', '1,00', '750.000,00'),
+        ('PRT0425', '1,00', '220.000,00'),
+        ('PRT1220-00212', '1,00', '275.000,00'),
+        ('PRT1220-00133/11', '2,00', '5.000,00'),
+    ]
+    assert items[0]['Description'] == \
+        'WHEEL CYLINDER RR RH/NO TYPE/No 00001/1476011260/IS Size/No Color/ISUZU'
+    assert all('|' not in item['Description'] for item in items)
+    assert items[1]['Brand'] == 'DENSO'